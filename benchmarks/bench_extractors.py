@@ -0,0 +1,103 @@
+# benchmarks/bench_extractors.py
+"""
+Compare HTML extractor backends on the bundled corpus of saved pages
+(benchmarks/corpus/), optionally topped up with page bodies archived in the
+artifact store.
+
+    python -m benchmarks.bench_extractors [--repeat 20] [--threads 8] [--from-store 50] [--pool-min-bytes 0]
+
+Reports per-backend parse time, throughput, text length and word overlap
+with the bs4 reference. It then times concurrent fetch-style parsing in
+threads with and without the process pool. By default every page goes to
+the pool in the pooled run, so small pages do not blur the comparison; pass
+--pool-min-bytes to measure the production threshold (POOL_MIN_BYTES) instead.
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from src.tools import extractors
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def load_corpus(path: str = CORPUS_DIR, from_store: int = 0) -> List[bytes]:
+    pages = []
+    for name in sorted(glob.glob(os.path.join(path, "*.html"))):
+        with open(name, "rb") as f:
+            pages.append(f.read())
+    if from_store:
+        from src.artifact_store import get_store
+        store = get_store()
+        rows = store.conn.execute(
+            "SELECT DISTINCT hash FROM refs WHERE kind = 'page_body' ORDER BY created_at DESC LIMIT ?", (from_store,)
+        ).fetchall()
+        pages.extend(store.get(r["hash"]) for r in rows)
+    return pages
+
+
+def overlap(a: str, b: str) -> float:
+    wa, wb = set(a.split()), set(b.split())
+    return len(wa & wb) / len(wa | wb) if wa | wb else 1.0
+
+
+def bench_backend(backend: str, pages: List[bytes], repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        texts = [extractors.extract(p, backend, max_chars=None) for p in pages]
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(pages)), texts
+
+
+def bench_concurrent(backend: str, pages: List[bytes], repeat: int, threads: int, use_pool: bool,
+                     pool_min_bytes: int = 0) -> float:
+    work = pages * repeat
+    if use_pool:
+        # warm the workers so process start-up is not counted
+        list(extractors._get_pool().map(extractors.extract, pages, [backend] * len(pages)))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(lambda p: extractors.extract_text(p, backend, use_pool=use_pool, pool_min_bytes=pool_min_bytes), work))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extractor backends")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--from-store", type=int, default=0, help="also use N archived page bodies")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--backends", nargs="*", default=extractors.available_extractors())
+    parser.add_argument("--pool-min-bytes", type=int, default=0,
+                        help=f"pages this size or larger go to the pool (production: {extractors.POOL_MIN_BYTES})")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.from_store)
+    total_mb = sum(len(p) for p in pages) / 1e6
+    print(f"{len(pages)} pages, {total_mb:.2f} MB, repeat {args.repeat}, workers {extractors.EXTRACT_WORKERS}\n")
+
+    _, reference = bench_backend("bs4", pages, 1)
+    print(f"{'backend':<12}{'ms/page':>10}{'MB/s':>10}{'chars':>10}{'vs bs4':>9}")
+    for backend in args.backends:
+        per_page, texts = bench_backend(backend, pages, args.repeat)
+        chars = sum(len(t) for t in texts) // len(texts)
+        similarity = sum(overlap(t, r) for t, r in zip(texts, reference)) / len(texts)
+        print(f"{backend:<12}{per_page * 1000:>10.2f}{total_mb / len(pages) / per_page:>10.1f}{chars:>10}{similarity:>9.2f}")
+
+    pooled_pages = sum(len(p) >= args.pool_min_bytes for p in pages)
+    print(f"\nconcurrent parsing, {args.threads} threads, {len(pages) * args.repeat} pages, "
+          f"{pooled_pages}/{len(pages)} per pass at or above the {args.pool_min_bytes}-byte pool threshold")
+    print(f"{'backend':<12}{'in-thread s':>12}{'pool s':>10}")
+    for backend in args.backends:
+        inline = bench_concurrent(backend, pages, args.repeat, args.threads, use_pool=False)
+        pooled = bench_concurrent(backend, pages, args.repeat, args.threads, use_pool=True,
+                                  pool_min_bytes=args.pool_min_bytes)
+        print(f"{backend:<12}{inline:>12.2f}{pooled:>10.2f}")
+    extractors.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
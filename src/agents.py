@@ -1,16 +1,29 @@
 # src/agents.py
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from src.state import GraphState
-from src.guardrails.schemas import FinalReport
+from src.guardrails.structured import (
+    JSON_RESPONSE_FORMAT, REPORT_KEYS, IncrementalJSONChecker, MalformedJSONError, report_errors, validate_report,
+)
 from src.guardrails.moderation import check_toxicity
 from src.guardrails.pii import redact_pii
 from src.tools.search import SearchTool
 from src.tools.groq_client import GroqClient
-from src.observability import log_trace
+from src.tools.numeric_facts import compute_market_figures, format_figures
+from src.model_router import router as default_router
+from src.docstore import DocRef, fact_content, materialize_facts, release_docs
+from src.artifact_store import get_store
+from src.cassette import cassette_active
+from src.incremental import diff_pages, load_previous, load_report, reusable, serp_hash, text_hash
+from src.observability import ARTIFACTS, log_trace
 import os
 import datetime
 import json
 import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 from src.pdf_generator import generate_pdf_report
 
@@ -21,6 +34,55 @@ search_tool = SearchTool()
 groq = GroqClient(api_key=os.environ.get("GROQ_API_KEY"))
 
 DEFAULT_MODEL = os.environ.get("DEFAULT_GROQ_MODEL", "llama-3.3-70b-versatile")
+WRITER_STRUCTURED_OUTPUT = os.environ.get("WRITER_STRUCTURED_OUTPUT", "0") == "1"
+# with precomputed figures in the prompt, raw excerpts only need enough text to cite
+WRITER_FACT_CHARS_WITH_FIGURES = int(os.environ.get("WRITER_FACT_CHARS_WITH_FIGURES", "200"))
+
+REPORTS_DIR = os.path.join(ARTIFACTS, "reports")
+os.makedirs(REPORTS_DIR, exist_ok=True)
+
+# Deadline-aware research: stop at a quorum of fetched pages or when the budget runs out
+RESEARCH_DEADLINE_MODE = os.environ.get("RESEARCH_DEADLINE_MODE", "0") == "1"
+RESEARCH_QUORUM = int(os.environ.get("RESEARCH_QUORUM", "6"))
+RESEARCH_BUDGET_S = float(os.environ.get("RESEARCH_BUDGET_S", "8"))
+RESEARCH_HEDGE_AFTER_S = float(os.environ.get("RESEARCH_HEDGE_AFTER_S", "3"))
+RESEARCH_HEDGE_EXTRA = int(os.environ.get("RESEARCH_HEDGE_EXTRA", "4"))
+RESEARCH_RESULTS = 10
+
+# Archived page text younger than this is reused instead of refetching
+PAGE_CACHE_TTL_S = float(os.environ.get("PAGE_CACHE_TTL_S", str(24 * 3600)))
+
+# Sub-query fan-out: pages researched per sub-query branch
+FANOUT_RESULTS_PER_QUERY = int(os.environ.get("FANOUT_RESULTS_PER_QUERY", "5"))
+
+REPORT_SCHEMA = (
+    "{title: string, summary: detailed paragraph (150-200 words), key_findings: [3-5 detailed bullet points], "
+    "facts: array of objects with {source, url, excerpt, content}, generated_at: ISO datetime}"
+)
+
+_count_lock = threading.Lock()
+
+
+def pdf_report_name(query: str, run_id: Optional[str]) -> str:
+    slug = re.sub(r"\W+", "_", query[:20]).strip("_")
+    return f"report_{slug}_{run_id}.pdf"
+
+
+def _count(state: Dict[str, Any], kind: str, hit: bool):
+    # per-run cache accounting (search/page/llm); read by the prefetcher's warm-hit report
+    counts = state.get("cache_hits")
+    if counts is None:
+        return
+    with _count_lock:
+        counts[f"{kind}_calls"] = counts.get(f"{kind}_calls", 0) + 1
+        if hit:
+            counts[f"{kind}_hits"] = counts.get(f"{kind}_hits", 0) + 1
+
+
+def search_width(deadline_mode: bool = RESEARCH_DEADLINE_MODE) -> int:
+    # deadline mode asks for spare results to hedge with; the SerpAPI cache is keyed on it
+    return RESEARCH_RESULTS + RESEARCH_HEDGE_EXTRA if deadline_mode else RESEARCH_RESULTS
+
 
 # -------------------------------
 # Researcher Agent
@@ -28,43 +90,212 @@ DEFAULT_MODEL = os.environ.get("DEFAULT_GROQ_MODEL", "llama-3.3-70b-versatile")
 class ResearcherAgent:
     name = "Researcher"
 
+    def __init__(self, deadline_mode: bool = RESEARCH_DEADLINE_MODE, top_k: Optional[int] = None):
+        self.deadline_mode = deadline_mode
+        self.top_k = top_k or search_width(deadline_mode)
+
     def run(self, state: GraphState) -> GraphState:
         q = state["query"]
         try:
-            # Get more search results (increased from 5 to 10)
-            results = search_tool.web_search(q, top_k=10)
-            enhanced_results = []
-
-            # Fetch full page content for each result
-            for result in results:
-                url = result["url"]
-                full_text = search_tool.fetch_full_page(url)
-
-                enhanced_result = result.copy()
-                enhanced_result["full_text"] = full_text
-
-                # Combine snippet and full text for richer context
-                combined_content = result["snippet"]
-                if full_text:
-                    combined_content += " " + full_text
-
-                enhanced_result["combined_content"] = combined_content
-                enhanced_results.append(enhanced_result)
+            if state.get("incremental"):
+                results, enhanced_results = self._research_incremental(q, state)
+            elif self.deadline_mode:
+                results, enhanced_results = self._research_with_deadline(q, state)
+            else:
+                # Get more search results (increased from 5 to 10)
+                results, from_cache = search_tool.web_search_cached(q, top_k=self.top_k)
+                _count(state, "search", from_cache)
+                enhanced_results = []
+
+                # Fetch full page content for each result
+                for result in results:
+                    full_text = self._fetch(result["url"], state)
+                    enhanced_results.append(self._enhance(result, full_text))
 
             state["docs"] = enhanced_results
 
-            # Use combined content for context (richer than just snippets)
-            state["context"].extend([r["combined_content"] for r in enhanced_results])
+            # Context holds doc-store ids; page text is materialized only when a node needs it
+            state["context"].extend([r.text_id for r in enhanced_results if r.has_text])
 
             state["tools_used"].append("web_search")
             state["tools_used"].append("full_page_fetch")
-            log_trace("researcher.web_search", {"count": len(results), "with_full_text": len([r for r in enhanced_results if r["full_text"]])})
+            log_trace("researcher.web_search", {"count": len(results), "with_full_text": len([r for r in enhanced_results if r.has_text])})
         except Exception as e:
             state["violations"].append(f"researcher_failed: {str(e)}")
             state["tool_error"] = True
             state["failure_count"] += 1
         return state
 
+    @staticmethod
+    def _fetch(url: str, state: Dict[str, Any], cancel: Optional[threading.Event] = None, timeout: float = 15) -> str:
+        run_id = state.get("run_id")
+        # recently archived text (e.g. from the prefetcher) stands in for a fetch,
+        # except under a cassette, where every fetch is recorded or replayed
+        text = None
+        if not cassette_active():
+            try:
+                cached = get_store().latest_for_url(url, "page_text", max_age=PAGE_CACHE_TTL_S)
+                text = get_store().get_text(cached) if cached else None
+            except Exception:
+                text = None
+        if text is not None:
+            _count(state, "page", True)
+            return text
+
+        raw, full_text = search_tool.fetch_page(url, timeout=timeout, cancel=cancel)
+        if cancel is not None and cancel.is_set():
+            # the deadline researcher has moved on; leave its state and the store alone
+            return ""
+        _count(state, "page", False)
+        if raw:
+            # archive the page body and extracted text; never fail research over it
+            try:
+                store = get_store()
+                store.put(raw, "page_body", run_id=run_id, url=url)
+                store.put(full_text, "page_text", run_id=run_id, url=url)
+            except Exception as e:
+                log_trace("researcher.archive_error", {"url": url, "error": str(e)})
+        return full_text
+
+    @staticmethod
+    def _enhance(result: Dict[str, Any], full_text: str) -> DocRef:
+        # Page text goes to the shared doc store; state keeps a compact reference
+        return DocRef.from_result(result, full_text)
+
+    def _research_incremental(self, q: str, state: GraphState):
+        """
+        Diff this week's SerpAPI results against the last snapshot for the query.
+        URLs whose listing is unchanged reuse the archived page text; only new or
+        changed listings are fetched. The outcome lands in outputs["incremental"].
+        """
+        previous = load_previous(q)
+        prev_pages = previous["pages"] if previous else {}
+        results, from_cache = search_tool.web_search_cached(q, top_k=self.top_k)
+        _count(state, "search", from_cache)
+        store = get_store()
+
+        enhanced_results, pages, reused = [], {}, 0
+        now = time.time()
+        for result in results:
+            url = result["url"]
+            listing_hash = serp_hash(result)
+            prior = prev_pages.get(url)
+            full_text, fetched_at = None, now
+            if reusable(prior, listing_hash, now):
+                full_text = store.get_text(prior["text_hash"])  # None once garbage-collected
+                if full_text is not None:
+                    reused += 1
+                    fetched_at = prior["fetched_at"]
+            if full_text is None:
+                full_text = self._fetch(url, state)
+            pages[url] = {"serp_hash": listing_hash, "text_hash": text_hash(full_text), "fetched_at": fetched_at}
+            enhanced_results.append(self._enhance(result, full_text))
+
+        delta = diff_pages(prev_pages, pages)
+        if not previous or not previous.get("report_hash"):
+            status = "full"
+        elif delta["new"] or delta["changed"]:
+            status = "delta"
+        else:
+            status = "unchanged"
+
+        state["page_hashes"] = pages
+        state["outputs"]["incremental"] = {
+            "status": status,
+            "previous": {k: previous[k] for k in ("run_id", "report_hash", "article_hash")} if previous else None,
+            "reused": reused,
+            **delta,
+        }
+        log_trace("researcher.incremental", {
+            "status": status, "reused": reused,
+            "new": len(delta["new"]), "changed": len(delta["changed"]), "removed": len(delta["removed"]),
+        })
+        return results, enhanced_results
+
+    def _research_with_deadline(self, q: str, state: GraphState):
+        """
+        Fetch pages concurrently and return once RESEARCH_QUORUM pages have text
+        or the time budget runs out. Fetches slower than RESEARCH_HEDGE_AFTER_S
+        (or failed ones) are hedged with the next-ranked spare results.
+        """
+        results, from_cache = search_tool.web_search_cached(q, top_k=self.top_k)
+        _count(state, "search", from_cache)
+        # the first top_k - RESEARCH_HEDGE_EXTRA results are fetched up front, the rest are hedge spares
+        n_primary = max(1, self.top_k - RESEARCH_HEDGE_EXTRA)
+        primary, spares = results[:n_primary], results[n_primary:]
+
+        budget_end = time.time() + RESEARCH_BUDGET_S
+        if state.get("deadline"):
+            budget_end = min(budget_end, state["deadline"])
+
+        cancel = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=max(1, len(results)))
+        pending: Dict[Future, Dict[str, Any]] = {}
+        texts: Dict[int, str] = {}
+        hedged = 0
+        fetched = 0
+
+        def launch(rank: int, result: Dict[str, Any]):
+            # connect and header waits are bounded by what is left of the budget
+            timeout = max(0.5, budget_end - time.time())
+            fut = pool.submit(self._fetch, result["url"], state, cancel, timeout)
+            pending[fut] = {"rank": rank, "started": time.time(), "hedged": False}
+
+        for rank, result in enumerate(primary):
+            launch(rank, result)
+        next_spare = 0
+
+        try:
+            while pending and fetched < RESEARCH_QUORUM:
+                now = time.time()
+                if now >= budget_end:
+                    break
+                done, _ = wait(list(pending), timeout=min(0.25, budget_end - now), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    info = pending.pop(fut)
+                    text = fut.result() or ""
+                    texts[info["rank"]] = text
+                    if text:
+                        fetched += 1
+                    elif next_spare < len(spares):
+                        # failed fetch: replace it with the next-ranked result right away
+                        launch(len(primary) + next_spare, spares[next_spare])
+                        next_spare += 1
+                        hedged += 1
+
+                now = time.time()
+                for info in list(pending.values()):
+                    if next_spare >= len(spares):
+                        break
+                    if not info["hedged"] and now - info["started"] >= RESEARCH_HEDGE_AFTER_S:
+                        info["hedged"] = True
+                        launch(len(primary) + next_spare, spares[next_spare])
+                        next_spare += 1
+                        hedged += 1
+        finally:
+            # stop in-flight downloads and drop anything not started yet
+            cancel.set()
+            skipped = len(pending)
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        enhanced_results = []
+        for rank, result in enumerate(primary + spares[:next_spare]):
+            if rank in texts:
+                enhanced_results.append(self._enhance(result, texts[rank]))
+            elif rank < len(primary):
+                # unfinished primary results still contribute their snippet
+                enhanced_results.append(self._enhance(result, ""))
+
+        state["pages_skipped"] = state.get("pages_skipped", 0) + skipped
+        log_trace("researcher.deadline", {
+            "fetched": fetched,
+            "quorum": RESEARCH_QUORUM,
+            "hedged": hedged,
+            "skipped": skipped,
+            "budget_exhausted": time.time() >= budget_end,
+        })
+        return results, enhanced_results
+
 
 # -------------------------------
 # Analyst Agent
@@ -73,31 +304,170 @@ class AnalystAgent:
     name = "Analyst"
 
     def run(self, state: GraphState) -> GraphState:
-        facts = []
-        for d in state.get("docs", []):
-            # Use combined_content if available (includes full page text), otherwise fall back to snippet
-            content = d.get("combined_content") or d.get("snippet", "")
-
-            # Clean up the content - remove excessive whitespace and limit length
-            content = " ".join(content.split())  # Normalize whitespace
-            if len(content) > 500:  # Limit content length for processing
-                content = content[:500] + "..."
-
-            facts.append({
-                "source": d.get("title") or d.get("url", ""),
-                "url": d.get("url", ""),
-                "excerpt": d.get("snippet", ""),
-                "content": content
-            })
+        facts, lengths = self.facts_from_docs(state.get("docs", []))
 
-        # Sort facts by relevance (prioritize those with full content)
-        facts.sort(key=lambda x: len(x["content"]), reverse=True)
+        # Currency, percentage and year figures from every doc in one batched pass
+        try:
+            state["outputs"]["figures"] = compute_market_figures([d.combined_content for d in state.get("docs", [])])
+            state["tools_used"].append("numeric_fact_engine")
+        except Exception as e:
+            log_trace("analyst.figures_error", {"error": str(e)})
 
         state["outputs"]["facts"] = facts
         state["tools_used"].append("analyst_web_parser")
-        log_trace("analyst.facts_extracted", {"n_facts": len(facts), "avg_content_length": sum(len(f["content"]) for f in facts) / len(facts) if facts else 0})
+        log_trace("analyst.facts_extracted", {"n_facts": len(facts), "avg_content_length": sum(lengths) / len(facts) if facts else 0})
         return state
 
+    @staticmethod
+    def facts_from_docs(docs):
+        facts = []
+        lengths = {}
+        for d in docs:
+            # Facts reference the doc store instead of copying page text;
+            # content (snippet + page text, normalized, clipped) is built on demand
+            fact = {
+                "source": d.title or d.url,
+                "url": d.url,
+                "excerpt": d.snippet,
+                "doc_id": d.text_id,
+            }
+            lengths[id(fact)] = len(fact_content(fact))
+            facts.append(fact)
+
+        # Sort facts by relevance (prioritize those with full content)
+        facts.sort(key=lambda x: lengths[id(x)], reverse=True)
+        return facts, [lengths[id(f)] for f in facts]
+
+
+# -------------------------------
+# Fan-out Research Agents (sub-query map-reduce)
+# -------------------------------
+class SubQueryPlannerAgent:
+    name = "SubQueryPlanner"
+
+    # fallback angles when the LLM expansion is unavailable
+    ASPECTS = [
+        "market size and forecast",
+        "key players and market share",
+        "growth drivers and trends",
+        "challenges and risks",
+        "regional breakdown",
+        "recent investments and deals",
+    ]
+
+    def __init__(self, groq_client=None, model_router=None):
+        self._groq = groq_client
+        self.router = model_router or default_router
+
+    @property
+    def groq(self):
+        if self._groq is None:
+            from src.tools.groq_client import GroqClient
+            self._groq = GroqClient()
+        return self._groq
+
+    def run(self, state: GraphState) -> GraphState:
+        q = state["query"]
+        n = state.get("fanout", 0)
+        sub_queries = []
+        messages = [
+            {"role": "system", "content": (
+                "You plan web research for market analysts. Return ONLY JSON: {\"sub_queries\": [string, ...]}"
+            )},
+            {"role": "user", "content": (
+                f"Split this market research question into {n} distinct, non-overlapping web search queries "
+                f"that together cover it broadly (size, players, trends, regions, risks): '{q}'"
+            )}
+        ]
+        try:
+            text, model, from_cache = self.router.chat(
+                self.groq, "draft", messages, max_tokens=300, deadline=state.get("deadline"),
+                temperature=0.2, use_cache=True, response_format=JSON_RESPONSE_FORMAT,
+            )
+            _count(state, "llm", from_cache)
+            sub_queries = [str(x).strip() for x in json.loads(text).get("sub_queries", []) if str(x).strip()]
+        except Exception as e:
+            log_trace("planner.error", {"error": str(e)})
+
+        for aspect in self.ASPECTS:
+            if len(sub_queries) >= n:
+                break
+            sub_queries.append(f"{q} {aspect}")
+
+        state["outputs"]["sub_queries"] = sub_queries[:n]
+        state["tools_used"].append("subquery_planner")
+        log_trace("planner.sub_queries", {"n": len(state["outputs"]["sub_queries"])})
+        return state
+
+
+class BranchResearchAgent:
+    """
+    One map branch: research a single sub-query and summarize its batch of
+    pages. Returns a partial-state update with a single entry in "partials".
+    """
+    name = "BranchResearcher"
+
+    def __init__(self, groq_client=None, model_router=None, top_k: int = FANOUT_RESULTS_PER_QUERY):
+        self._groq = groq_client
+        self.router = model_router or default_router
+        self.top_k = top_k
+
+    @property
+    def groq(self):
+        if self._groq is None:
+            from src.tools.groq_client import GroqClient
+            self._groq = GroqClient()
+        return self._groq
+
+    def run(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        sub_query = task["sub_query"]
+        # branches cannot write the run's cache_hits; their counts ride back on
+        # the partial and node_reduce adds them up
+        task.setdefault("cache_hits", {})
+        partial = {"sub_query": sub_query, "summary": "", "facts": [], "tools_used": [],
+                   "cache_hits": task["cache_hits"]}
+        docs = []
+        try:
+            results, from_cache = search_tool.web_search_cached(sub_query, top_k=self.top_k)
+            _count(task, "search", from_cache)
+            with ThreadPoolExecutor(max_workers=max(1, len(results))) as pool:
+                texts = list(pool.map(lambda r: ResearcherAgent._fetch(r["url"], task), results))
+            docs = [ResearcherAgent._enhance(r, t) for r, t in zip(results, texts)]
+            partial["tools_used"] += ["web_search", "full_page_fetch"]
+
+            facts, _ = AnalystAgent.facts_from_docs(docs)
+            # materialize the few facts the reducer needs so branch docs can be released now
+            partial["facts"] = materialize_facts(facts[:3])
+            partial["summary"] = self._summarize(sub_query, partial["facts"], task)
+            partial["tools_used"].append("groq_branch_summary")
+        except Exception as e:
+            partial["error"] = str(e)
+            log_trace("branch.error", {"sub_query": sub_query, "error": str(e)})
+        finally:
+            release_docs(docs)
+
+        if not partial["summary"]:
+            partial["summary"] = " ".join(f.get("excerpt", "") for f in partial["facts"])
+        log_trace("branch.done", {"sub_query": sub_query, "n_docs": len(docs), "n_facts": len(partial["facts"])})
+        return {"partials": [partial]}
+
+    def _summarize(self, sub_query: str, facts, task: Dict[str, Any]) -> str:
+        messages = [
+            {"role": "system", "content": (
+                "You summarize research notes for a market analyst. Be factual and concise; keep figures and sources."
+            )},
+            {"role": "user", "content": (
+                f"Summarize what these sources say about '{sub_query}' in 80-120 words.\n\n" + "\n".join(
+                    f"{i+1}. {f.get('source', 'Source')}: {f.get('content', '')}" for i, f in enumerate(facts)
+                )
+            )}
+        ]
+        text, model, from_cache = self.router.chat(
+            self.groq, "draft", messages, max_tokens=300, deadline=task.get("deadline"), temperature=0.1, use_cache=True,
+        )
+        _count(task, "llm", from_cache)
+        return redact_pii(text.strip())
+
 
 # -------------------------------
 # Writer Agent
@@ -156,24 +526,56 @@ class AnalystAgent:
 class WriterAgent:
     name = "Writer"
 
-    def __init__(self, groq_client=None):
+    def __init__(self, groq_client=None, model_router=None, structured: bool = WRITER_STRUCTURED_OUTPUT):
         from src.tools.groq_client import GroqClient
         self.groq = groq_client or GroqClient()
-        self.model_dev = os.environ.get("DEV_GROQ_MODEL", "llama-3.3-70b-versatile")
+        self.router = model_router or default_router
+        self.structured = structured
 
     def run(self, state: GraphState) -> GraphState:
         facts = state["outputs"].get("facts", [])[:5]  # increased to 5 facts for better content
 
-        messages = [
+        # Incremental re-research: send only the new/changed facts plus the prior report
+        prior_block = ""
+        incremental = state["outputs"].get("incremental") or {}
+        if incremental.get("status") == "delta":
+            prior = load_report(incremental.get("previous"))
+            if prior:
+                delta_urls = set(incremental["new"]) | set(incremental["changed"])
+                facts = [f for f in state["outputs"].get("facts", []) if f.get("url") in delta_urls][:5]
+                prior_block = (
+                    "PRIOR REPORT (previous run; keep what still holds and update it with the new facts, "
+                    "facts may come from either):\n" + json.dumps(prior, default=str) + "\n\n"
+                )
+
+        figures = format_figures(state["outputs"].get("figures") or {})
+        content_chars = None
+        if figures:
+            prior_block += "PRECOMPUTED FIGURES (extracted from all sources; prefer these over figures in raw excerpts):\n" + figures + "\n\n"
+            content_chars = WRITER_FACT_CHARS_WITH_FIGURES
+
+        messages = self._messages(state["query"], facts, prior_block, content_chars)
+        return self._write(state, messages)
+
+    @staticmethod
+    def _messages(query: str, facts, preamble: str = "", content_chars: Optional[int] = None):
+        def content(fact):
+            text = fact_content(fact)
+            if content_chars is not None and len(text) > content_chars:
+                text = text[:content_chars] + "..."
+            return text
+
+        return [
             {"role": "system", "content": (
                 "You are an expert market research writer. Create comprehensive, well-structured reports. "
                 "Return ONLY valid JSON with complete, detailed content. No truncation or incomplete sentences. "
-                "Schema: {title: string, summary: detailed paragraph (150-200 words), key_findings: [3-5 detailed bullet points], facts: array of objects with {source, url, excerpt, content}, generated_at: ISO datetime}"
+                "Schema: " + REPORT_SCHEMA
             )},
             {"role": "user", "content": (
-                f"Create a comprehensive market research report based on these facts about: '{state['query']}'\n\n"
+                f"Create a comprehensive market research report based on these facts about: '{query}'\n\n"
+                + preamble +
                 f"AVAILABLE FACTS:\n" + "\n".join([
-                    f"{i+1}. Source: {fact.get('source', 'Unknown')}\n   URL: {fact.get('url', '')}\n   Excerpt: {fact.get('excerpt', '')}\n   Content: {fact.get('content', '')}"
+                    f"{i+1}. Source: {fact.get('source', 'Unknown')}\n   URL: {fact.get('url', '')}\n   Excerpt: {fact.get('excerpt', '')}\n   Content: {content(fact)}"
                     for i, fact in enumerate(facts)
                 ]) + "\n\n"
                 f"REQUIREMENTS:\n"
@@ -191,22 +593,35 @@ class WriterAgent:
             )}
         ]
 
-        try:
-            text = self.groq.chat(
-                messages=messages,
-                model=self.model_dev,
-                max_tokens=1200,  # Increased for more complete responses
-                temperature=0.1,  # Slightly higher for better creativity while maintaining accuracy
-                use_cache=True
-            )
-
-            # --- Extract JSON block ---
-            match = re.search(r"\{.*\}", text, re.S)
-            if not match:
-                raise ValueError(f"No JSON object found in LLM output: {text[:200]}")
-            json_str = match.group(0)
+    def run_reduce(self, state: GraphState) -> GraphState:
+        """
+        Reduce step of the fan-out graph: merge the per-sub-query partial
+        summaries into the final report_raw.
+        """
+        partials = state.get("partials", [])
+        facts = [f for p in partials for f in p.get("facts", [])]
+        facts.sort(key=lambda f: len(f.get("content", "")), reverse=True)
+        state["outputs"]["facts"] = facts
+        preamble = "PARTIAL SUMMARIES (one per research sub-query; synthesize them, do not list them):\n" + "\n".join(
+            f"{i+1}. [{p['sub_query']}] {p.get('summary', '')}" for i, p in enumerate(partials)
+        ) + "\n\n"
+        messages = self._messages(state["query"], facts[:8], preamble)
+        return self._write(state, messages)
 
-            parsed = json.loads(json_str)
+    def _write(self, state: GraphState, messages) -> GraphState:
+        try:
+            # Start on the stage's preferred tier; escalate to a larger model when
+            # the output is not valid JSON or does not match the report schema.
+            # (With the default two tiers the writer already starts on the top
+            # one; failed fields are then escalated by _repair instead.)
+            for escalation in range(self.router.max_escalations("writer") + 1):
+                try:
+                    parsed, model = self._generate(messages, state, escalation)
+                    break
+                except Exception as e:
+                    if escalation == self.router.max_escalations("writer"):
+                        raise
+                    log_trace("writer.escalate", {"escalation": escalation, "error": str(e)[:200]})
 
             # Apply PII redaction to text fields only, not datetime
             if "summary" in parsed:
@@ -225,7 +640,7 @@ class WriterAgent:
 
             state["outputs"]["report_raw"] = parsed
             state["tools_used"].append("groq_writer")
-            log_trace("writer.success", {"keys": list(parsed.keys())})
+            log_trace("writer.success", {"keys": list(parsed.keys()), "model": model})
 
         except json.JSONDecodeError as e:
             state["violations"].append("writer_json_parse_failure")
@@ -240,6 +655,125 @@ class WriterAgent:
 
         return state
 
+    def _generate(self, messages, state: GraphState, escalation: int):
+        if self.structured:
+            try:
+                return self._generate_structured(messages, state, escalation)
+            except (MalformedJSONError, json.JSONDecodeError, RuntimeError) as e:
+                # JSON mode rejected for streaming, or a broken stream: the plain
+                # request below still works against any model
+                log_trace("writer.structured_fallback", {"escalation": escalation, "error": str(e)[:200]})
+
+        text, model, from_cache = self.router.chat(
+            self.groq,
+            "writer",
+            messages,
+            max_tokens=1200,  # Increased for more complete responses
+            deadline=state.get("deadline"),
+            escalation=escalation,
+            temperature=0.1,  # Slightly higher for better creativity while maintaining accuracy
+            use_cache=True
+        )
+        _count(state, "llm", from_cache)
+        return self._parse_report(text), model
+
+    def _generate_structured(self, messages, state: GraphState, escalation: int):
+        # Structured mode: JSON response format, streamed through an incremental
+        # checker so malformed output is abandoned as soon as it goes wrong.
+        checker = IncrementalJSONChecker(allowed_keys=REPORT_KEYS)
+        text, model, from_cache = self.router.chat(
+            self.groq,
+            "writer",
+            messages,
+            max_tokens=1200,
+            deadline=state.get("deadline"),
+            escalation=escalation,
+            on_chunk=checker.feed,
+            temperature=0.1,
+            use_cache=True,
+            response_format=JSON_RESPONSE_FORMAT,
+        )
+        _count(state, "llm", from_cache)
+        if not checker.complete:
+            raise MalformedJSONError("truncated JSON output")
+        parsed = json.loads(text)
+        errors = report_errors(self._with_timestamp(parsed))
+        if errors:
+            parsed = self._repair(parsed, errors, state)
+        return parsed, model
+
+    def _repair(self, parsed: Dict[str, Any], errors, state: GraphState) -> Dict[str, Any]:
+        """
+        Ask for corrected values of only the failing top-level fields instead of
+        regenerating the whole report.
+        """
+        fields = sorted({str(loc[0]) for loc, _ in errors if loc})
+        if not fields:
+            raise ValueError(f"report failed validation: {errors}")
+
+        messages = [
+            {"role": "system", "content": (
+                "You repair fields of a market research report so they match its JSON schema. "
+                "Return ONLY a JSON object containing exactly the requested fields."
+            )},
+            {"role": "user", "content": (
+                f"Schema: {REPORT_SCHEMA}\n\n"
+                f"Validation errors:\n" + "\n".join(f"- {'.'.join(map(str, loc))}: {msg}" for loc, msg in errors) + "\n\n"
+                f"Fields to fix: {', '.join(fields)}\n"
+                f"Current values: {json.dumps({f: parsed.get(f) for f in fields}, default=str)}"
+            )}
+        ]
+        # repairs start on the small tier; a failed repair is retried one tier up
+        last = self.router.max_escalations("repair")
+        for escalation in range(last + 1):
+            checker = IncrementalJSONChecker(allowed_keys=fields)
+            try:
+                text, model, from_cache = self.router.chat(
+                    self.groq,
+                    "repair",
+                    messages,
+                    max_tokens=600,
+                    deadline=state.get("deadline"),
+                    escalation=escalation,
+                    on_chunk=checker.feed,
+                    temperature=0.0,
+                    use_cache=True,
+                    response_format=JSON_RESPONSE_FORMAT,
+                )
+                _count(state, "llm", from_cache)
+                if not checker.complete:
+                    raise MalformedJSONError("truncated JSON output")
+                repaired = {**parsed, **json.loads(text)}
+                remaining = report_errors(self._with_timestamp(repaired))
+                log_trace("writer.repair", {"model": model, "fields": fields, "escalation": escalation, "ok": not remaining})
+                if not remaining:
+                    return repaired
+                error = ValueError(f"report still invalid after repair: {remaining[:3]}")
+            except ValueError as e:
+                error = e
+            if escalation < last:
+                log_trace("writer.repair_escalate", {"escalation": escalation, "error": str(error)[:200]})
+        raise error
+
+    @staticmethod
+    def _with_timestamp(parsed: Dict[str, Any]) -> Dict[str, Any]:
+        candidate = dict(parsed)
+        candidate.setdefault("generated_at", datetime.datetime.utcnow().isoformat())
+        return candidate
+
+    @classmethod
+    def _parse_report(cls, text: str) -> Dict[str, Any]:
+        # --- Extract JSON block ---
+        match = re.search(r"\{.*\}", text, re.S)
+        if not match:
+            raise ValueError(f"No JSON object found in LLM output: {text[:200]}")
+        parsed = json.loads(match.group(0))
+
+        errors = report_errors(cls._with_timestamp(parsed))
+        if errors:
+            raise ValueError(f"report failed validation: {errors[:3]}")
+        return parsed
+
 
 # -------------------------------
 # Narrative Writer Agent (for Article Mode)
@@ -247,10 +781,10 @@ class WriterAgent:
 class NarrativeWriterAgent:
     name = "NarrativeWriter"
 
-    def __init__(self, groq_client=None):
+    def __init__(self, groq_client=None, model_router=None):
         from src.tools.groq_client import GroqClient
         self.groq = groq_client or GroqClient()
-        self.model_dev = os.environ.get("DEV_GROQ_MODEL", "llama-3.3-70b-versatile")
+        self.router = model_router or default_router
 
     def run(self, state: GraphState) -> GraphState:
         report = state["outputs"].get("report")
@@ -296,13 +830,16 @@ class NarrativeWriterAgent:
         ]
 
         try:
-            text = self.groq.chat(
-                messages=messages,
-                model=self.model_dev,
+            text, model, from_cache = self.router.chat(
+                self.groq,
+                "narrative_writer",
+                messages,
                 max_tokens=2000,  # Increased for complete articles
+                deadline=state.get("deadline"),
                 temperature=0.2,  # Lower temperature for more consistent output
                 use_cache=True
             )
+            _count(state, "llm", from_cache)
 
             # Clean up the response - remove any incomplete sections
             if text:
@@ -319,7 +856,7 @@ class NarrativeWriterAgent:
 
             state["outputs"]["article"] = text
             state["tools_used"].append("narrative_writer")
-            log_trace("narrative_writer.success", {"word_count": len(text.split())})
+            log_trace("narrative_writer.success", {"word_count": len(text.split()), "model": model})
 
         except Exception as e:
             state["violations"].append("narrative_writer_failed")
@@ -343,17 +880,33 @@ class ReviewerAgent:
             return state
 
         try:
-            validated = FinalReport.parse_obj(raw)
+            validated = validate_report(raw)
             state["outputs"]["report"] = validated.dict()
             state["schema_ok"] = True
             state["tools_used"].append("pydantic_validation")
             log_trace("reviewer.schema_ok", {"title": validated.title})
 
-            # Generate PDF report and save filename in state outputs
-            pdf_filename = generate_pdf_report(validated.dict(), filename=f"report_{state['query'][:20].replace(' ', '_')}.pdf")
-            state["outputs"]["pdf_report"] = pdf_filename
-            state["tools_used"].append("pdf_generator")
-            log_trace("reviewer.pdf_generated", {"filename": pdf_filename})
+            # Render the PDF to a temp file and archive it; the store's blob is the
+            # only copy, so it counts against the gc quota
+            run_id = state.get("run_id")
+            pdf_name = pdf_report_name(state["query"], run_id)
+            fd, tmp = tempfile.mkstemp(suffix=".pdf")
+            os.close(fd)
+            try:
+                generate_pdf_report(validated.dict(), filename=tmp)
+                state["tools_used"].append("pdf_generator")
+                try:
+                    store = get_store()
+                    store.put(json.dumps(raw, default=str), "report", run_id=run_id, name="report.json")
+                    state["outputs"]["pdf_blob"] = store.put_file(tmp, "pdf", run_id=run_id, name=pdf_name)
+                except Exception as e:
+                    log_trace("reviewer.archive_error", {"error": str(e)})
+                    # without the store, keep the PDF under artifacts/reports
+                    state["outputs"]["pdf_report"] = shutil.move(tmp, os.path.join(REPORTS_DIR, pdf_name))
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            log_trace("reviewer.pdf_generated", {"name": pdf_name, "blob": state["outputs"].get("pdf_blob")})
 
         except Exception as e:
             state["schema_ok"] = False
@@ -0,0 +1,247 @@
+# src/artifact_store.py
+import argparse
+import gzip
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from src.observability import ARTIFACTS, log_trace
+from src.profiling import traced
+
+try:
+    import zstandard as zstd
+except ImportError:  # optional; gzip is always available
+    zstd = None
+
+STORE_DIR = os.environ.get("ARTIFACT_STORE_DIR", os.path.join(ARTIFACTS, "store"))
+MMAP_THRESHOLD = int(os.environ.get("ARTIFACT_MMAP_THRESHOLD", str(1 << 20)))
+DEFAULT_QUOTA = os.environ.get("ARTIFACT_STORE_QUOTA", "2GB")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_lru ON blobs(last_access);
+CREATE TABLE IF NOT EXISTS refs (
+    run_id TEXT,
+    kind TEXT NOT NULL,
+    url TEXT,
+    name TEXT,
+    hash TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_run ON refs(run_id);
+CREATE INDEX IF NOT EXISTS refs_url ON refs(url, created_at);
+CREATE INDEX IF NOT EXISTS refs_hash ON refs(hash);
+"""
+
+
+def parse_size(value: Union[str, int]) -> int:
+    if isinstance(value, int):
+        return value
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", value.upper())
+    if not m:
+        raise ValueError(f"invalid size: {value}")
+    scale = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}[m.group(2)]
+    return int(float(m.group(1)) * scale)
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for page bodies, extracted text, reports and PDFs.
+    Blobs are compressed (zstd when installed, gzip otherwise) under
+    blobs/<hash[:2]>/<hash>; a SQLite index maps run ids and URLs to blobs.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"), isolation_level=None,
+                                    timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.codec = "zstd" if zstd is not None else "gzip"
+
+    def _path(self, h: str) -> str:
+        return os.path.join(self.root, "blobs", h[:2], h)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstd.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @traced("tool.artifact_put")
+    def put(self, data: Union[bytes, str], kind: str, run_id: Optional[str] = None,
+            url: Optional[str] = None, name: Optional[str] = None) -> str:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        h = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT hash FROM blobs WHERE hash = ?", (h,)).fetchone()
+            if row is None:
+                packed = self._compress(data)
+                path = self._path(h)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(packed)
+                os.replace(tmp, path)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (h, kind, self.codec, len(data), len(packed), now, now),
+                )
+            else:
+                self.conn.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (now, h))
+            if run_id or url or name:
+                self.conn.execute(
+                    "INSERT INTO refs VALUES (?, ?, ?, ?, ?, ?)", (run_id, kind, url, name, h, now)
+                )
+        return h
+
+    def put_file(self, path: str, kind: str, run_id: Optional[str] = None, name: Optional[str] = None) -> str:
+        with open(path, "rb") as f:
+            return self.put(f.read(), kind, run_id=run_id, name=name or os.path.basename(path))
+
+    def has(self, h: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (h,)).fetchone() is not None
+
+    def get(self, h: str) -> Optional[bytes]:
+        with self._lock:
+            row = self.conn.execute("SELECT codec, stored_size FROM blobs WHERE hash = ?", (h,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (time.time(), h))
+        path = self._path(h)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            if row["stored_size"] >= MMAP_THRESHOLD:
+                # large blobs: decompress straight from the page cache instead of copying the file in
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return self._decompress_stream(row["codec"], mm)
+            return self._decompress_stream(row["codec"], f)
+
+    @staticmethod
+    def _decompress_stream(codec: str, fileobj) -> bytes:
+        if codec == "zstd":
+            if zstd is None:
+                raise RuntimeError("blob is zstd-compressed but zstandard is not installed")
+            with zstd.ZstdDecompressor().stream_reader(fileobj) as reader:
+                return reader.read()
+        with gzip.GzipFile(fileobj=fileobj, mode="rb") as gz:
+            return gz.read()
+
+    def get_text(self, h: str) -> Optional[str]:
+        data = self.get(h)
+        return data.decode("utf-8") if data is not None else None
+
+    def export(self, h: str, path: str) -> str:
+        data = self.get(h)
+        if data is None:
+            raise KeyError(h)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def run_artifacts(self, run_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT kind, url, name, hash, created_at FROM refs WHERE run_id = ? ORDER BY created_at", (run_id,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def latest_for_url(self, url: str, kind: str, max_age: Optional[float] = None) -> Optional[str]:
+        since = time.time() - max_age if max_age is not None else 0
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT hash FROM refs WHERE url = ? AND kind = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+                (url, kind, since),
+            ).fetchone()
+        return row["hash"] if row else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS size, COALESCE(SUM(stored_size), 0) AS stored FROM blobs"
+            ).fetchone()
+        return dict(row)
+
+    def gc(self, quota: Union[str, int] = DEFAULT_QUOTA) -> Dict:
+        """
+        Evict least-recently-accessed blobs (and their index refs) until the
+        stored size fits the quota.
+        """
+        quota_bytes = parse_size(quota)
+        removed, freed = 0, 0
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+            if total > quota_bytes:
+                for row in self.conn.execute(
+                    "SELECT hash, stored_size FROM blobs ORDER BY last_access"
+                ).fetchall():
+                    if total - freed <= quota_bytes:
+                        break
+                    try:
+                        os.remove(self._path(row["hash"]))
+                    except FileNotFoundError:
+                        pass
+                    self.conn.execute("DELETE FROM blobs WHERE hash = ?", (row["hash"],))
+                    self.conn.execute("DELETE FROM refs WHERE hash = ?", (row["hash"],))
+                    removed += 1
+                    freed += row["stored_size"]
+        result = {"removed": removed, "freed_bytes": freed, "quota_bytes": quota_bytes}
+        log_trace("artifact_store.gc", result)
+        return result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed artifact store")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_gc = sub.add_parser("gc", help="evict least-recently-used blobs to fit a disk quota")
+    p_gc.add_argument("--quota", default=DEFAULT_QUOTA, help="e.g. 500MB, 2GB")
+    sub.add_parser("stats")
+    p_ls = sub.add_parser("ls", help="list artifacts recorded for a run")
+    p_ls.add_argument("run_id")
+    p_get = sub.add_parser("get", help="write a blob to a file")
+    p_get.add_argument("hash")
+    p_get.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.cmd == "gc":
+        print(store.gc(args.quota))
+    elif args.cmd == "stats":
+        print(store.stats())
+    elif args.cmd == "ls":
+        for a in store.run_artifacts(args.run_id):
+            print(f"{a['hash'][:16]}  {a['kind']:<12} {a['name'] or a['url'] or ''}")
+    else:
+        print(store.export(args.hash, args.output))
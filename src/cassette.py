@@ -0,0 +1,288 @@
+# src/cassette.py
+import argparse
+import atexit
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from src.observability import ARTIFACTS, log_trace
+
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE", "")   # "", record, replay, replay_fast
+CASSETTE_PATH = os.environ.get("CASSETTE_PATH", os.path.join(ARTIFACTS, "cassettes", "cassette.jsonl.gz"))
+MODES = ("record", "replay", "replay_fast")
+# kinds whose requests embed upstream output (prompts built from fetched pages);
+# on a key miss they fall back to the next unplayed recording of the same model
+SEQUENTIAL_KINDS = ("groq",)
+
+
+class CassetteMiss(RuntimeError):
+    pass
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps({"kind": kind, **request}, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def read_entries(path: str) -> Iterator[Dict[str, Any]]:
+    # a recording cut short (crash, kill) lacks the gzip trailer; keep what was flushed
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                yield json.loads(line)
+        except (EOFError, ValueError):
+            log_trace("cassette.truncated", {"path": path})
+
+
+def encode_bytes(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_bytes(data: str) -> bytes:
+    return base64.b64decode(data)
+
+
+class Cassette:
+    """
+    Record/replay of upstream calls (SerpAPI, page downloads, Groq) as gzip
+    JSONL: one line per interaction with its request key, response and
+    elapsed seconds. Replay serves responses at the recorded latency, or
+    immediately in replay_fast mode, and never touches the network.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = CASSETTE_MODE):
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.meta: Dict[str, Any] = {}
+        self.stats = collections.Counter()
+        self._file = None
+        self._closed = False
+        if mode == "record":
+            # the file is opened on the first write, by the creating process only:
+            # spawned parse-pool workers re-import __main__ (and so the tools),
+            # and must not truncate the parent's recording
+            self._owner = os.getpid()
+            self._started = time.time()
+        else:
+            self._entries: Dict[str, Deque[Dict[str, Any]]] = collections.defaultdict(collections.deque)
+            self._sequence: Dict[str, Deque[Dict[str, Any]]] = collections.defaultdict(collections.deque)
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _load(self):
+        for entry in read_entries(self.path):
+            if entry["kind"] == "meta":
+                self.meta.update(entry["response"])
+                continue
+            entry["played"] = False
+            self._entries[entry["key"]].append(entry)
+            if entry["kind"] in SEQUENTIAL_KINDS:
+                self._sequence[f"{entry['kind']}:{entry.get('desc')}"].append(entry)
+
+    def _write(self, entry: Dict[str, Any]):
+        with self._lock:
+            if self._closed:
+                return
+            if self._file is None:
+                if os.getpid() != self._owner:
+                    raise RuntimeError("cassette recording belongs to another process")
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = gzip.open(self.path, "wt", encoding="utf-8")
+                atexit.register(self.close)
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def set_meta(self, **meta):
+        if self.recording:
+            self.meta.update(meta)
+            self._write({"kind": "meta", "key": "", "response": meta})
+
+    def record(self, kind: str, request: Dict[str, Any], response: Any, elapsed: float, desc: str = ""):
+        self._write({
+            "kind": kind, "key": request_key(kind, request), "desc": desc,
+            "t": round(time.time() - self._started, 4), "elapsed": round(elapsed, 4), "response": response,
+        })
+
+    def lookup(self, kind: str, request: Dict[str, Any], desc: str = "") -> Dict[str, Any]:
+        key = request_key(kind, request)
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                # repeated identical requests replay in recorded order; the last one repeats
+                entry = queue.popleft() if len(queue) > 1 else queue[0]
+                self.stats["hits"] += 1
+            elif kind in SEQUENTIAL_KINDS:
+                seq = self._sequence.get(f"{kind}:{desc}")
+                while seq and seq[0]["played"]:
+                    seq.popleft()
+                if not seq:
+                    self.stats["misses"] += 1
+                    raise CassetteMiss(f"{kind} request not in cassette: {desc}")
+                entry = seq.popleft()
+                self.stats["sequential"] += 1
+                log_trace("cassette.sequential_match", {"kind": kind, "desc": desc})
+            else:
+                self.stats["misses"] += 1
+                log_trace("cassette.miss", {"kind": kind, "desc": desc})
+                raise CassetteMiss(f"{kind} request not in cassette: {desc}")
+            entry["played"] = True
+        return entry
+
+    def delay(self, seconds: float, cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Sleep for a recorded latency (skipped in replay_fast). Returns False
+        when `cancel` was set while waiting.
+        """
+        if self.mode != "replay" or seconds <= 0:
+            return not (cancel is not None and cancel.is_set())
+        if cancel is not None:
+            return not cancel.wait(seconds)
+        time.sleep(seconds)
+        return True
+
+    def call(self, kind: str, request: Dict[str, Any], live: Callable[[], Any],
+             encode: Callable[[Any], Any] = lambda r: r, decode: Callable[[Any], Any] = lambda r: r,
+             desc: str = "", cancel: Optional[threading.Event] = None,
+             cancelled: Callable[[], Exception] = lambda: CassetteMiss("cancelled")) -> Any:
+        """
+        Record mode: run `live()` and store its (encoded) result and latency.
+        Replay modes: return the decoded recording after the recorded latency.
+        Errors raised by `live()` are recorded and re-raised as RuntimeError on replay.
+        """
+        if self.recording:
+            start = time.perf_counter()
+            try:
+                result = live()
+            except Exception as e:
+                self.record(kind, request, {"error": f"{type(e).__name__}: {e}"}, time.perf_counter() - start, desc)
+                raise
+            self.record(kind, request, {"ok": encode(result)}, time.perf_counter() - start, desc)
+            return result
+
+        entry = self.lookup(kind, request, desc)
+        if not self.delay(entry["elapsed"], cancel):
+            raise cancelled()
+        if "error" in entry["response"]:
+            raise RuntimeError(f"recorded error: {entry['response']['error']}")
+        return decode(entry["response"]["ok"])
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_active: Optional[Cassette] = None
+_active_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    The process-wide cassette configured by CASSETTE_MODE / CASSETTE_PATH,
+    or the one installed with use_cassette(); None when disabled.
+    """
+    global _active
+    if _active is None and CASSETTE_MODE:
+        with _active_lock:
+            if _active is None:
+                _active = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+    return _active
+
+
+def use_cassette(path: str, mode: str) -> Cassette:
+    global _active
+    with _active_lock:
+        if _active is not None:
+            _active.close()
+        _active = Cassette(path, mode)
+    return _active
+
+
+def eject():
+    global _active
+    with _active_lock:
+        if _active is not None:
+            _active.close()
+        _active = None
+
+
+def cassette_active() -> bool:
+    # local response caches are bypassed so every call goes through the cassette
+    return get_cassette() is not None
+
+
+def summarize(path: str) -> Dict[str, Any]:
+    kinds: Dict[str, Dict[str, float]] = {}
+    meta: Dict[str, Any] = {}
+    span = 0.0
+    for entry in read_entries(path):
+        if entry["kind"] == "meta":
+            meta.update(entry["response"])
+            continue
+        k = kinds.setdefault(entry["kind"], {"calls": 0, "errors": 0, "elapsed_s": 0.0})
+        k["calls"] += 1
+        k["errors"] += int("error" in entry["response"])
+        k["elapsed_s"] = round(k["elapsed_s"] + entry["elapsed"], 3)
+        span = max(span, entry["t"] + entry["elapsed"])
+    return {"path": path, "bytes": os.path.getsize(path), "meta": meta, "kinds": kinds, "recorded_span_s": round(span, 3)}
+
+
+def _run(query: str) -> Dict[str, Any]:
+    from src.graph import run
+    start = time.perf_counter()
+    res = run(query)
+    return {"run_id": res["run_id"], "wall_s": round(time.perf_counter() - start, 3),
+            "violations": res["violations"], "outputs": sorted(res["outputs"])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay pipeline runs without the network")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_record = sub.add_parser("record")
+    p_record.add_argument("query")
+    p_replay = sub.add_parser("replay", help="re-run the recorded query offline")
+    p_replay.add_argument("--fast", action="store_true", help="ignore recorded latencies")
+    p_replay.add_argument("--query", help="override the recorded query")
+    sub.add_parser("info")
+    for p in sub.choices.values():
+        p.add_argument("--path", default=CASSETTE_PATH)
+    args = parser.parse_args()
+
+    # tools import src.cassette; install the cassette there, not in __main__
+    import src.cassette as cassettes
+
+    if args.cmd == "record":
+        cassette = cassettes.use_cassette(args.path, "record")
+        cassette.set_meta(query=args.query, recorded_at=time.time())
+        try:
+            result = cassettes._run(args.query)
+        finally:
+            cassettes.eject()
+    elif args.cmd == "replay":
+        cassette = cassettes.use_cassette(args.path, "replay_fast" if args.fast else "replay")
+        query = args.query or cassette.meta.get("query")
+        if not query:
+            parser.error("the cassette has no recorded query; pass --query")
+        result = cassettes._run(query)
+        result["cassette"] = dict(cassette.stats)
+        cassettes.eject()
+    else:
+        result = cassettes.summarize(args.path)
+    print(json.dumps(result, indent=2, default=str))
+    # non-zero exit when the replay needed calls the cassette could not serve
+    if args.cmd == "replay" and result["cassette"].get("misses"):
+        sys.exit(1)
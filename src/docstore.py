@@ -0,0 +1,127 @@
+# src/docstore.py
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+FACT_CONTENT_CHARS = 500
+
+
+class DocStore:
+    """
+    Content-addressed, reference-counted text store shared by all runs in the
+    process. Graph state keeps only ids; identical pages fetched by concurrent
+    runs are held once.
+    """
+
+    def __init__(self):
+        self._texts: Dict[str, str] = {}
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def put(self, text: str) -> Optional[str]:
+        if not text:
+            return None
+        doc_id = self.key(text)
+        with self._lock:
+            if doc_id not in self._texts:
+                self._texts[doc_id] = text
+            self._refs[doc_id] = self._refs.get(doc_id, 0) + 1
+        return doc_id
+
+    def get(self, doc_id: Optional[str]) -> str:
+        if not doc_id:
+            return ""
+        return self._texts.get(doc_id, "")
+
+    def release(self, doc_ids: Iterable[Optional[str]]):
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id not in self._refs:
+                    continue
+                self._refs[doc_id] -= 1
+                if self._refs[doc_id] <= 0:
+                    del self._refs[doc_id]
+                    self._texts.pop(doc_id, None)
+
+    def __len__(self):
+        return len(self._texts)
+
+
+docstore = DocStore()
+
+
+class DocRef:
+    """
+    Compact state record for a retrieved page; the page text lives in the
+    DocStore and is only materialized through .text / .combined_content.
+    """
+    __slots__ = ("url", "title", "snippet", "text_id")
+
+    def __init__(self, url: str, title: str, snippet: str, text_id: Optional[str] = None):
+        self.url = url
+        self.title = title
+        self.snippet = snippet
+        self.text_id = text_id
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any], full_text: str) -> "DocRef":
+        return cls(
+            url=result.get("url", ""),
+            title=result.get("title", ""),
+            snippet=result.get("snippet", ""),
+            text_id=docstore.put(full_text),
+        )
+
+    @property
+    def has_text(self) -> bool:
+        return self.text_id is not None
+
+    @property
+    def text(self) -> str:
+        return docstore.get(self.text_id)
+
+    @property
+    def combined_content(self) -> str:
+        # snippet and full text combined for richer context
+        text = self.text
+        return f"{self.snippet} {text}" if text else self.snippet
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"url": self.url, "title": self.title, "snippet": self.snippet, "text_id": self.text_id}
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, data):
+        for k in self.__slots__:
+            setattr(self, k, data.get(k))
+
+    def __repr__(self):
+        return f"DocRef(url={self.url!r}, text_id={self.text_id!r})"
+
+
+def fact_content(fact: Dict[str, Any]) -> str:
+    """
+    Materialize a fact's content: snippet plus page text, whitespace
+    normalized and clipped to FACT_CONTENT_CHARS.
+    """
+    if "content" in fact:
+        return fact["content"]
+    text = docstore.get(fact.get("doc_id"))
+    content = f"{fact.get('excerpt', '')} {text}" if text else fact.get("excerpt", "")
+    content = " ".join(content.split())
+    if len(content) > FACT_CONTENT_CHARS:
+        content = content[:FACT_CONTENT_CHARS] + "..."
+    return content
+
+
+def materialize_facts(facts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{**{k: v for k, v in f.items() if k != "doc_id"}, "content": fact_content(f)} for f in facts]
+
+
+def release_docs(docs: Iterable[DocRef]):
+    docstore.release(d.text_id for d in docs if isinstance(d, DocRef))
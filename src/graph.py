@@ -1,17 +1,33 @@
 from langgraph.graph import StateGraph, START, END
-from src.state import init_state, GraphState
-from src.agents import ResearcherAgent, AnalystAgent, WriterAgent, ReviewerAgent, NarrativeWriterAgent
+from langgraph.types import Send
+from src.state import init_state, GraphState, FANOUT_SUBQUERIES
+from src.agents import (
+    ResearcherAgent, AnalystAgent, WriterAgent, ReviewerAgent, NarrativeWriterAgent,
+    SubQueryPlannerAgent, BranchResearchAgent, REPORTS_DIR, pdf_report_name,
+)
 from src.fallbacks import CircuitBreaker
 from src.observability import log_trace, export_run_summary
+from src.docstore import materialize_facts, release_docs
+from src.incremental import INCREMENTAL_RESEARCH, load_article, load_report, save_snapshot
+from src.prefetch import record_request
+from src.run_history import record_run, timed_node
+from src.artifact_store import get_store
 from src.pdf_generator import generate_pdf_report
+from src.profiling import PROFILE_ENABLED, profile_run, traced
+import argparse
 import json
 import os
+import time
+
+FANOUT_MAX_CONCURRENCY = int(os.environ.get("FANOUT_MAX_CONCURRENCY", "4"))
 
 # Initialize agents
 researcher = ResearcherAgent()
 analyst = AnalystAgent()
 writer = WriterAgent()
 reviewer = ReviewerAgent()
+planner = SubQueryPlannerAgent()
+branch_researcher = BranchResearchAgent()
 
 # Circuit breaker
 cb = CircuitBreaker(threshold=3)
@@ -61,12 +77,65 @@ def node_reviewer(state: GraphState) -> GraphState:
     return state
 
 
+def node_expand(state: GraphState) -> GraphState:
+    try:
+        state = planner.run(state)
+    except Exception:
+        state["failure_count"] += 1
+        state["violations"].append("planner_failed")
+    return state
+
+
+def node_research_branch(task: dict) -> dict:
+    # map step: runs once per Send(); returns only its "partials" entry
+    return branch_researcher.run(task)
+
+
+def node_reduce(state: GraphState) -> GraphState:
+    counts = state.setdefault("cache_hits", {})
+    for p in state.get("partials", []):
+        for k, v in p.get("cache_hits", {}).items():
+            counts[k] = counts.get(k, 0) + v
+    tools = [t for p in state.get("partials", []) for t in p.get("tools_used", [])]
+    state["tools_used"].extend(sorted(set(tools), key=tools.index))
+    failed = [p["sub_query"] for p in state.get("partials", []) if p.get("error")]
+    if failed:
+        state["violations"].append(f"branches_failed: {len(failed)}")
+    try:
+        state = writer.run_reduce(state)
+    except Exception:
+        state["failure_count"] += 1
+        state["violations"].append("writer_failed")
+    return state
+
+
+def node_reuse_report(state: GraphState) -> GraphState:
+    # incremental mode found nothing material: serve the previous run's report
+    previous = state["outputs"].get("incremental", {}).get("previous")
+    report = load_report(previous)
+    if not report:
+        state["violations"].append("incremental_report_missing")
+        return state
+    state["outputs"]["report_raw"] = report
+    state["tools_used"].append("incremental_reuse")
+    # the reviewer still validates, moderates and archives a PDF for this run;
+    # only when it accepts the report is the writer skipped
+    state = node_reviewer(state)
+    if not state["outputs"].get("report"):
+        return state
+    article = load_article(previous)
+    if article:
+        state["outputs"]["article"] = article
+    log_trace("graph.report_reused", {"previous_run_id": previous.get("run_id")})
+    return state
+
+
 def node_partial_summary(state: GraphState) -> GraphState:
     # graceful short-circuit when too many failures
     state["outputs"]["report_partial"] = {
         "title": f"Partial results for: {state['query']}",
         "summary": "We hit reliability issues; here are partial findings.",
-        "facts": state.get("outputs", {}).get("facts", []),
+        "facts": materialize_facts(state.get("outputs", {}).get("facts", [])),
     }
     log_trace("graph.partial_summary", {"failure_count": state["failure_count"]})
     return state
@@ -77,16 +146,58 @@ def node_partial_summary(state: GraphState) -> GraphState:
 # -------------------------------
 Graph = StateGraph(GraphState)  # type: ignore
 
-Graph.add_node("research", node_research)
-Graph.add_node("analyst", node_analyst)
-Graph.add_node("writer", node_writer)
-Graph.add_node("reviewer", node_reviewer)
-Graph.add_node("partial", node_partial_summary)
+
+def add_node(name: str, fn):
+    # every node is timed into the run history and gets a profiling span
+    # (the span is a no-op unless the run is profiled)
+    Graph.add_node(name, timed_node(name, traced(f"node.{name}")(fn)))
+
+
+add_node("research", node_research)
+add_node("analyst", node_analyst)
+add_node("writer", node_writer)
+add_node("reviewer", node_reviewer)
+add_node("partial", node_partial_summary)
+add_node("reuse_report", node_reuse_report)
+add_node("expand", node_expand)
+add_node("research_branch", node_research_branch)
+add_node("reduce", node_reduce)
+
+
+# Entry: linear research, or sub-query fan-out when state["fanout"] > 0
+def start_route(state: GraphState):
+    return ["expand"] if state.get("fanout", 0) > 0 else ["research"]
+
+
+# Map: one research branch per sub-query, run in parallel (capped by max_concurrency)
+def fan_out(state: GraphState):
+    return [
+        Send("research_branch", {"sub_query": sq, "run_id": state["run_id"], "deadline": state["deadline"],
+                                 "cache_hits": {}})
+        for sq in state["outputs"].get("sub_queries", [])
+    ] or ["reduce"]
+
 
 # Edges
-Graph.add_edge(START, "research")
+Graph.add_conditional_edges(START, start_route)
+Graph.add_conditional_edges("expand", fan_out)
+Graph.add_edge("research_branch", "reduce")
 Graph.add_edge("research", "analyst")
-Graph.add_edge("analyst", "writer")
+
+
+# Conditional edge: skip the LLM stages when incremental research found no material change
+def analyst_to_next(state: GraphState):
+    if state["outputs"].get("incremental", {}).get("status") == "unchanged":
+        return ["reuse_report"]
+    return ["writer"]
+
+
+def reuse_to_next(state: GraphState):
+    return [END] if state["outputs"].get("report") else ["writer"]
+
+
+Graph.add_conditional_edges("analyst", analyst_to_next)
+Graph.add_conditional_edges("reuse_report", reuse_to_next)
 
 
 # Conditional edge: writer → reviewer or partial summary
@@ -97,6 +208,7 @@ def writer_to_next(state: GraphState):
 
 
 Graph.add_conditional_edges("writer", writer_to_next)
+Graph.add_conditional_edges("reduce", writer_to_next)
 
 Graph.add_edge("reviewer", END)
 Graph.add_edge("partial", END)
@@ -112,40 +224,74 @@ def node_narrative_writer(state: GraphState) -> GraphState:
         state["violations"].append("narrative_writer_failed")
     return state
 
-Graph.add_node("narrative_writer", node_narrative_writer)
+add_node("narrative_writer", node_narrative_writer)
 Graph.add_edge("reviewer", "narrative_writer")
 Graph.add_edge("narrative_writer", END)
 
 # -------------------------------
 # Runner
 # -------------------------------
-def run(query: str):
-    state = init_state(query)
+def run(query: str, incremental: bool = INCREMENTAL_RESEARCH, fanout: int = FANOUT_SUBQUERIES,
+        profile: bool = PROFILE_ENABLED):
+    if incremental and fanout > 0:
+        # snapshots are keyed on the linear researcher's SerpAPI listing and page hashes
+        raise ValueError("incremental research does not support sub-query fan-out; set one of them")
+    state = init_state(query, incremental=incremental, fanout=fanout)
     app = Graph.compile()
-    res = app.invoke(state)
+    started_at = time.time()
+    with profile_run(state["run_id"], enabled=profile):
+        res = app.invoke(state, config={"max_concurrency": FANOUT_MAX_CONCURRENCY})
+    if res.get("incremental") and res["outputs"].get("report"):
+        try:
+            save_snapshot(query, res["run_id"], res["page_hashes"], res["outputs"]["report"], res["outputs"].get("article"))
+        except Exception as e:
+            log_trace("graph.snapshot_error", {"error": str(e)})
+    try:
+        record_request(query, res.get("cache_hits", {}))
+    except Exception as e:
+        log_trace("graph.prefetch_record_error", {"error": str(e)})
+    # callers (run summary, job queue, CLI) get fact content, not doc-store ids
+    if res["outputs"].get("facts"):
+        res["outputs"]["facts"] = materialize_facts(res["outputs"]["facts"])
+    # every node is done with the page text; drop this run's doc-store references
+    release_docs(res.get("docs", []))
     log_trace(
         "graph.run_complete",
         {"query": query, "result_keys": list(res["outputs"].keys()), "violations": res["violations"]},
     )
     export_run_summary(
         {
+            "run_id": res["run_id"],
             "query": query,
             "outputs": res["outputs"],
             "violations": res["violations"],
             "tools_used": res["tools_used"],
+            "cache_hits": res.get("cache_hits", {}),
         }
     )
+    try:
+        record_run(res, started_at)
+    except Exception as e:
+        log_trace("graph.run_history_error", {"error": str(e)})
     return res
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the market research graph")
+    parser.add_argument("--profile", action="store_true", default=PROFILE_ENABLED,
+                        help="write CPU, allocation and per-node timing profiles to artifacts/profiles/")
+    args = parser.parse_args()
     q = input("Enter your market research query: ")
-    result = run(q)
+    result = run(q, profile=args.profile)
     print(json.dumps(result["outputs"], indent=2, default=str))
     print("Violations:", result["violations"])
 
-    # Display PDF report filename if generated
-    if "pdf_report" in result["outputs"]:
-        pdf_filename = result["outputs"]["pdf_report"]
+    # The PDF is archived in the artifact store; write a copy for the interactive user
+    if "pdf_blob" in result["outputs"]:
+        pdf_filename = get_store().export(result["outputs"]["pdf_blob"],
+                                          os.path.join(REPORTS_DIR, pdf_report_name(q, result.get("run_id"))))
+    else:
+        pdf_filename = result["outputs"].get("pdf_report")
+    if pdf_filename:
         print(f"PDF report generated: {pdf_filename}")
         print(f"Full path: {os.path.abspath(pdf_filename)}")
@@ -0,0 +1,120 @@
+# src/guardrails/structured.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.guardrails.schemas import FinalReport
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+REPORT_KEYS = frozenset(["title", "summary", "key_findings", "facts", "generated_at"])
+
+# pydantic v2 compiles the model's validator when the class is defined
+if hasattr(FinalReport, "model_validate"):
+    def validate_report(obj: Dict[str, Any]) -> FinalReport:
+        return FinalReport.model_validate(obj)
+else:  # pydantic v1
+    def validate_report(obj: Dict[str, Any]) -> FinalReport:
+        return FinalReport.parse_obj(obj)
+
+
+def report_errors(obj: Any) -> List[Tuple[tuple, str]]:
+    """
+    Validate a parsed report and return [(loc, message)], empty when valid.
+    """
+    if not isinstance(obj, dict):
+        return [((), "report must be a JSON object")]
+    try:
+        validate_report(obj)
+        return []
+    except ValidationError as e:
+        return [(tuple(err["loc"]), err["msg"]) for err in e.errors()]
+
+
+class MalformedJSONError(ValueError):
+    pass
+
+
+class IncrementalJSONChecker:
+    """
+    Structural JSON checker fed with streamed tokens. Raises MalformedJSONError
+    as soon as the output can no longer become a valid top-level object
+    (prose before the '{', mismatched brackets, trailing text, unknown
+    top-level keys), so a bad generation can be aborted early.
+    """
+
+    def __init__(self, allowed_keys: Optional[Iterable[str]] = None):
+        self.allowed_keys = frozenset(allowed_keys) if allowed_keys else None
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_chars: List[str] = []
+        self.started = False
+        self.done = False
+        self.consumed = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.done
+
+    def feed(self, chunk: str):
+        for ch in chunk:
+            self._step(ch)
+            self.consumed += 1
+
+    def _fail(self, reason: str):
+        raise MalformedJSONError(f"{reason} at offset {self.consumed}")
+
+    def _step(self, ch: str):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                if self.expect_key:
+                    self._check_key("".join(self.key_chars))
+                    self.expect_key = False
+                return
+            if self.expect_key:
+                self.key_chars.append(ch)
+            return
+
+        if ch.isspace():
+            return
+        if self.done:
+            self._fail("trailing text after JSON object")
+        if not self.started:
+            if ch != "{":
+                self._fail("output does not start with a JSON object")
+            self.started = True
+
+        if ch == '"':
+            self.in_string = True
+            self.key_chars = []
+        elif ch in "{[":
+            self.stack.append(ch)
+            self.expect_key = ch == "{"
+        elif ch in "}]":
+            opener = "{" if ch == "}" else "["
+            if not self.stack or self.stack[-1] != opener:
+                self._fail(f"unexpected '{ch}'")
+            self.stack.pop()
+            self.expect_key = False
+            if not self.stack:
+                self.done = True
+        elif ch == ",":
+            if not self.stack:
+                self._fail("unexpected ','")
+            self.expect_key = self.stack[-1] == "{"
+        elif ch == ":":
+            if not self.stack or self.stack[-1] != "{":
+                self._fail("unexpected ':'")
+        elif self.expect_key:
+            self._fail("object key must be a string")
+
+    def _check_key(self, key: str):
+        # only top-level keys are checked against the schema
+        if self.allowed_keys is not None and len(self.stack) == 1 and key not in self.allowed_keys:
+            self._fail(f"unexpected top-level key {key!r}")
@@ -0,0 +1,131 @@
+# src/incremental.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.artifact_store import get_store
+from src.job_queue import normalize_query
+from src.observability import ARTIFACTS, log_trace
+
+INCREMENTAL_RESEARCH = os.environ.get("INCREMENTAL_RESEARCH", "0") == "1"
+SNAPSHOT_DB = os.environ.get("INCREMENTAL_DB", os.path.join(ARTIFACTS, "incremental.db"))
+# an unchanged listing does not prove unchanged content; archived text older
+# than this is refetched (and re-hashed) anyway
+MAX_REUSE_S = float(os.environ.get("INCREMENTAL_MAX_REUSE_S", str(14 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    run_id TEXT PRIMARY KEY,
+    query_key TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    report_hash TEXT,
+    article_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_query ON snapshots(query_key, created_at);
+CREATE TABLE IF NOT EXISTS snapshot_pages (
+    run_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    serp_hash TEXT NOT NULL,
+    text_hash TEXT,
+    fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS snapshot_pages_run ON snapshot_pages(run_id);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(SNAPSHOT_DB) or ".", exist_ok=True)
+        _conn = sqlite3.connect(SNAPSHOT_DB, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.executescript(SCHEMA)
+        columns = {r["name"] for r in _conn.execute("PRAGMA table_info(snapshot_pages)")}
+        if "fetched_at" not in columns:
+            # snapshots from before revalidation: their text counts as stale
+            _conn.execute("ALTER TABLE snapshot_pages ADD COLUMN fetched_at REAL")
+    return _conn
+
+
+def serp_hash(result: Dict[str, Any]) -> str:
+    # cheap change signal from the search listing itself
+    return hashlib.sha256(f"{result.get('title', '')}\n{result.get('snippet', '')}".encode("utf-8")).hexdigest()
+
+
+def text_hash(text: str) -> Optional[str]:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text else None
+
+
+def load_previous(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Latest snapshot for the normalized query: its run id, report/article
+    blob hashes and {url: {serp_hash, text_hash, fetched_at}}.
+    """
+    with _lock:
+        conn = _db()
+        row = conn.execute(
+            "SELECT * FROM snapshots WHERE query_key = ? ORDER BY created_at DESC LIMIT 1",
+            (normalize_query(query),),
+        ).fetchone()
+        if row is None:
+            return None
+        pages = conn.execute(
+            "SELECT url, serp_hash, text_hash, fetched_at FROM snapshot_pages WHERE run_id = ?", (row["run_id"],)
+        ).fetchall()
+    snapshot = dict(row)
+    snapshot["pages"] = {p["url"]: {"serp_hash": p["serp_hash"], "text_hash": p["text_hash"], "fetched_at": p["fetched_at"]}
+                         for p in pages}
+    return snapshot
+
+
+def load_report(snapshot: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not snapshot or not snapshot.get("report_hash"):
+        return None
+    text = get_store().get_text(snapshot["report_hash"])
+    return json.loads(text) if text else None
+
+
+def load_article(snapshot: Dict[str, Any]) -> Optional[str]:
+    if not snapshot or not snapshot.get("article_hash"):
+        return None
+    return get_store().get_text(snapshot["article_hash"])
+
+
+def save_snapshot(query: str, run_id: str, pages: Dict[str, Dict[str, Optional[str]]],
+                  report: Dict[str, Any], article: Optional[str] = None):
+    store = get_store()
+    report_hash = store.put(json.dumps(report, default=str), "report", run_id=run_id, name="report.json")
+    article_hash = store.put(article, "article", run_id=run_id, name="article.md") if article else None
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                (run_id, normalize_query(query), time.time(), report_hash, article_hash),
+            )
+            conn.executemany(
+                "INSERT INTO snapshot_pages VALUES (?, ?, ?, ?, ?)",
+                [(run_id, url, p["serp_hash"], p["text_hash"], p.get("fetched_at")) for url, p in pages.items()],
+            )
+    log_trace("incremental.snapshot_saved", {"run_id": run_id, "pages": len(pages)})
+
+
+def reusable(prior: Optional[Dict[str, Any]], listing_hash: str, now: float) -> bool:
+    # archived text stands in for a fetch while the listing is unchanged and the text is recent
+    return bool(prior and prior["serp_hash"] == listing_hash and prior["text_hash"]
+                and prior.get("fetched_at") and now - prior["fetched_at"] < MAX_REUSE_S)
+
+
+def diff_pages(previous: Dict[str, Dict[str, Optional[str]]],
+               current: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, List[str]]:
+    new = [u for u in current if u not in previous]
+    changed = [u for u in current if u in previous and current[u]["text_hash"] != previous[u]["text_hash"]]
+    removed = [u for u in previous if u not in current]
+    return {"new": new, "changed": changed, "removed": removed}
@@ -0,0 +1,242 @@
+# src/job_queue.py
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Optional
+
+from src.observability import ARTIFACTS, log_trace
+
+QUEUE_DB = os.environ.get("JOB_QUEUE_DB", os.path.join(ARTIFACTS, "jobs.db"))
+MAX_ATTEMPTS = int(os.environ.get("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = float(os.environ.get("JOB_QUEUE_RETRY_BASE", "30"))
+LEASE_SECONDS = float(os.environ.get("JOB_QUEUE_LEASE", "900"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    submissions INTEGER NOT NULL DEFAULT 1,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_query
+    ON jobs(query_key) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS jobs_ready
+    ON jobs(status, priority DESC, run_after);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form used to collapse duplicate submissions:
+    lowercase, punctuation stripped, whitespace collapsed.
+    """
+    q = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(q.split())
+
+
+def run_error(res: Dict[str, Any]) -> Optional[str]:
+    """
+    Why a graph.run result counts as failed, or None for a success: no
+    validated report, or a node that raised or hit a tool error.
+    """
+    if res.get("tool_error") or res.get("failure_count") or not res.get("outputs", {}).get("report"):
+        return "run failed: " + (", ".join(res.get("violations", [])) or "no report")
+    return None
+
+
+class JobQueue:
+    """
+    Durable SQLite-backed queue in front of graph.run.
+
+    Pending or running jobs with the same normalized query are merged:
+    a duplicate submit() returns the existing job id, so every submitter
+    reads the result of a single pipeline run.
+    """
+
+    def __init__(self, path: str = QUEUE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def submit(self, query: str, priority: int = 0) -> int:
+        key = normalize_query(query)
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE query_key = ? AND status IN ('pending', 'running')",
+                (key,),
+            ).fetchone()
+            if row:
+                # attach to the in-flight job; a higher priority submission promotes it
+                self.conn.execute(
+                    "UPDATE jobs SET submissions = submissions + 1, priority = MAX(priority, ?) WHERE id = ?",
+                    (priority, row["id"]),
+                )
+                job_id, collapsed = row["id"], True
+            else:
+                cur = self.conn.execute(
+                    "INSERT INTO jobs (query, query_key, priority, run_after, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (query, key, priority, now, now),
+                )
+                job_id, collapsed = cur.lastrowid, False
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        log_trace("queue.submit", {"job_id": job_id, "priority": priority, "collapsed": collapsed})
+        return job_id
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """
+        Atomically take the highest-priority ready job. Running jobs whose
+        lease expired (crashed worker) are eligible again until their attempts
+        are used up; then they are marked failed. The returned row's
+        `attempts` identifies this claim for complete() and fail().
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [r["id"] for r in self.conn.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            )]
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, lease_until = NULL, error = ? WHERE id = ?",
+                [(now, f"lease expired after {MAX_ATTEMPTS} attempts", job_id) for job_id in expired],
+            )
+            row = self.conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'pending' AND run_after <= ?) "
+                "OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY priority DESC, run_after, id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                    (now + LEASE_SECONDS, row["id"]),
+                )
+                row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        for job_id in expired:
+            log_trace("queue.failed", {"job_id": job_id, "attempts": MAX_ATTEMPTS, "error": "lease expired"})
+        return row
+
+    def _finish(self, job_id: int, attempt: int, sets: str, params: tuple) -> bool:
+        # only the worker holding the current claim may settle the job; after its
+        # lease expired and another worker re-claimed it, `attempts` has moved on
+        cur = self.conn.execute(
+            f"UPDATE jobs SET {sets}, lease_until = NULL WHERE id = ? AND status = 'running' AND attempts = ?",
+            (*params, job_id, attempt),
+        )
+        if cur.rowcount == 0:
+            log_trace("queue.lease_lost", {"job_id": job_id, "attempt": attempt})
+            return False
+        return True
+
+    def complete(self, job_id: int, attempt: int, result: Dict[str, Any]) -> bool:
+        return self._finish(job_id, attempt, "status = 'done', result = ?, finished_at = ?",
+                            (json.dumps(result, default=str), time.time()))
+
+    def fail(self, job_id: int, attempt: int, error: str) -> bool:
+        if attempt < MAX_ATTEMPTS:
+            wait = RETRY_BASE_SECONDS * (2 ** (attempt - 1))
+            if self._finish(job_id, attempt, "status = 'pending', run_after = ?, error = ?", (time.time() + wait, error)):
+                log_trace("queue.retry_scheduled", {"job_id": job_id, "attempts": attempt, "wait": wait})
+                return True
+        elif self._finish(job_id, attempt, "status = 'failed', finished_at = ?, error = ?", (time.time(), error)):
+            log_trace("queue.failed", {"job_id": job_id, "attempts": attempt, "error": error})
+            return True
+        return False
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def wait(self, job_id: int, timeout: Optional[float] = None, poll: float = 1.0) -> Optional[Dict[str, Any]]:
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in ("done", "failed"):
+                return job
+            if deadline is not None and time.time() >= deadline:
+                return job
+            time.sleep(poll)
+
+    def process_next(self, runner: Optional[Callable[[str], Dict[str, Any]]] = None) -> bool:
+        """
+        Run one ready job through the graph. Returns False when the queue is idle.
+        """
+        job = self.claim()
+        if job is None:
+            return False
+        if runner is None:
+            from src.graph import run as runner
+        log_trace("queue.job_start", {"job_id": job["id"], "attempt": job["attempts"]})
+        try:
+            res = runner(job["query"])
+            error = run_error(res)
+            if error:
+                # graph.run reports pipeline failures in the result instead of raising
+                self.fail(job["id"], job["attempts"], error)
+                return True
+            if self.complete(job["id"], job["attempts"], {
+                "outputs": res["outputs"],
+                "violations": res["violations"],
+                "tools_used": res["tools_used"],
+            }):
+                log_trace("queue.job_done", {"job_id": job["id"], "submissions": job["submissions"]})
+        except Exception as e:
+            self.fail(job["id"], job["attempts"], str(e))
+        return True
+
+    def work(self, runner: Optional[Callable[[str], Dict[str, Any]]] = None, poll: float = 2.0, once: bool = False):
+        while True:
+            busy = self.process_next(runner)
+            if once and not busy:
+                return
+            if not busy:
+                time.sleep(poll)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Market research job queue")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_submit = sub.add_parser("submit")
+    p_submit.add_argument("query")
+    p_submit.add_argument("--priority", type=int, default=0)
+    p_work = sub.add_parser("work")
+    p_work.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    p_status = sub.add_parser("status")
+    p_status.add_argument("job_id", type=int)
+    args = parser.parse_args()
+
+    queue = JobQueue()
+    if args.cmd == "submit":
+        print(queue.submit(args.query, priority=args.priority))
+    elif args.cmd == "work":
+        queue.work(once=args.once)
+    else:
+        print(json.dumps(queue.get(args.job_id), indent=2, default=str))
@@ -0,0 +1,170 @@
+# src/model_router.py
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.observability import log_trace
+from src.profiling import span
+
+DEFAULT_MODEL = os.environ.get("DEFAULT_GROQ_MODEL", "llama-3.3-70b-versatile")
+
+# Ordered small -> large. s_per_ktok is the prior latency estimate (seconds per
+# 1k prompt+completion tokens) used until real calls have been observed.
+DEFAULT_TIERS = [
+    {"model": "llama-3.1-8b-instant", "context_tokens": 131072, "s_per_ktok": 0.6},
+    {"model": os.environ.get("DEV_GROQ_MODEL", DEFAULT_MODEL), "context_tokens": 131072, "s_per_ktok": 2.5},
+]
+
+# Preferred starting tier per stage: drafts/extraction start small, final prose starts large.
+DEFAULT_STAGE_TIERS = {
+    "draft": 0,
+    "extraction": 0,
+    "repair": 0,
+    "writer": 1,
+    "narrative_writer": 1,
+}
+
+EWMA_ALPHA = 0.3
+
+
+def _load_tiers() -> List[Dict[str, Any]]:
+    """
+    GROQ_MODEL_TIERS is either a JSON list of tier dicts or a comma-separated
+    list of model names (small -> large).
+    """
+    raw = os.environ.get("GROQ_MODEL_TIERS")
+    if not raw:
+        return [dict(t) for t in DEFAULT_TIERS]
+    try:
+        tiers = json.loads(raw)
+    except ValueError:
+        tiers = [{"model": m.strip()} for m in raw.split(",") if m.strip()]
+    for i, t in enumerate(tiers):
+        t.setdefault("context_tokens", 131072)
+        t.setdefault("s_per_ktok", 0.6 + 2.0 * i)
+    return tiers
+
+
+def _load_stage_tiers() -> Dict[str, int]:
+    # GROQ_STAGE_TIERS="writer=1,narrative_writer=1"
+    stages = dict(DEFAULT_STAGE_TIERS)
+    for part in os.environ.get("GROQ_STAGE_TIERS", "").split(","):
+        if "=" in part:
+            stage, tier = part.split("=", 1)
+            stages[stage.strip()] = int(tier)
+    return stages
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    # ~4 characters per token is close enough for routing decisions
+    return sum(len(m.get("content", "")) for m in messages) // 4 + 4 * len(messages)
+
+
+class ModelRouter:
+    """
+    Picks a Groq model per stage from a tier list, using the prompt size,
+    the run's remaining latency budget and observed per-model latency.
+    """
+
+    def __init__(self, tiers: Optional[List[Dict[str, Any]]] = None, stage_tiers: Optional[Dict[str, int]] = None):
+        self.tiers = tiers or _load_tiers()
+        self.stage_tiers = stage_tiers or _load_stage_tiers()
+        self._s_per_ktok = {t["model"]: t["s_per_ktok"] for t in self.tiers}
+        self._lock = threading.Lock()
+
+    def max_escalations(self, stage: str) -> int:
+        return len(self.tiers) - 1 - self._start_tier(stage)
+
+    def _start_tier(self, stage: str) -> int:
+        return min(self.stage_tiers.get(stage, len(self.tiers) - 1), len(self.tiers) - 1)
+
+    def expected_latency(self, model: str, tokens: int) -> float:
+        return self._s_per_ktok.get(model, 2.5) * tokens / 1000
+
+    def choose(self, stage: str, messages: List[Dict[str, str]], max_tokens: int,
+               deadline: Optional[float] = None, escalation: int = 0) -> str:
+        prompt_tokens = estimate_tokens(messages)
+        total_tokens = prompt_tokens + max_tokens
+        remaining = deadline - time.time() if deadline else None
+        wanted = min(self._start_tier(stage) + escalation, len(self.tiers) - 1)
+
+        # the prompt must fit the model's context window; bigger tiers only
+        fits = [i for i, t in enumerate(self.tiers) if total_tokens <= t["context_tokens"]]
+        floor = fits[0] if fits else len(self.tiers) - 1
+        wanted = max(wanted, floor)
+
+        # step down while the expected latency would blow the remaining budget
+        chosen, reason = wanted, "preferred"
+        if remaining is not None:
+            for i in range(wanted, floor - 1, -1):
+                if self.expected_latency(self.tiers[i]["model"], total_tokens) <= remaining:
+                    chosen = i
+                    break
+            else:
+                chosen = floor
+            if chosen != wanted:
+                reason = "latency_budget"
+        if escalation and reason == "preferred":
+            reason = "escalation"
+
+        model = self.tiers[chosen]["model"]
+        log_trace("router.decision", {
+            "stage": stage,
+            "model": model,
+            "tier": chosen,
+            "reason": reason,
+            "escalation": escalation,
+            "prompt_tokens": prompt_tokens,
+            "remaining_s": round(remaining, 2) if remaining is not None else None,
+            "expected_s": round(self.expected_latency(model, total_tokens), 2),
+        })
+        return model
+
+    def observe(self, model: str, latency: float, tokens: int):
+        if tokens <= 0:
+            return
+        sample = latency * 1000 / tokens
+        with self._lock:
+            prev = self._s_per_ktok.get(model, sample)
+            self._s_per_ktok[model] = (1 - EWMA_ALPHA) * prev + EWMA_ALPHA * sample
+
+    def chat(self, client, stage: str, messages: List[Dict[str, str]], max_tokens: int,
+             deadline: Optional[float] = None, escalation: int = 0,
+             on_chunk: Optional[Callable[[str], None]] = None, **kwargs):
+        """
+        Route and run a chat call. Returns (text, model, from_cache).
+        With on_chunk the response is streamed and each delta is passed to it;
+        an exception raised by on_chunk aborts the request.
+        """
+        model = self.choose(stage, messages, max_tokens, deadline=deadline, escalation=escalation)
+        start = time.time()
+        with span(f"tool.groq_chat.{stage}"):
+            if on_chunk is None:
+                text, from_cache = client.chat_cached(messages=messages, model=model, max_tokens=max_tokens, **kwargs)
+            else:
+                parts = []
+                stream = client.chat_stream(messages=messages, model=model, max_tokens=max_tokens, **kwargs)
+                try:
+                    while True:
+                        try:
+                            delta = next(stream)
+                        except StopIteration as done:
+                            # chat_stream returns whether it was served from cache
+                            from_cache = bool(done.value)
+                            break
+                        on_chunk(delta)
+                        parts.append(delta)
+                finally:
+                    stream.close()
+                text = "".join(parts)
+        elapsed = time.time() - start
+        # cache hits say nothing about the model's latency
+        if not from_cache:
+            self.observe(model, elapsed, estimate_tokens(messages) + max_tokens)
+        log_trace("router.call", {"stage": stage, "model": model, "latency_s": round(elapsed, 3), "from_cache": from_cache})
+        return text, model, from_cache
+
+
+router = ModelRouter()
@@ -15,6 +15,13 @@ def log_trace(step: str, data: dict):
         pass
 
 def export_run_summary(summary: dict):
+    # run_summary.json always holds the latest run; every run is also archived by run id
     summary_file = os.path.join(ARTIFACTS, "run_summary.json")
+    text = json.dumps(summary, indent=2, default=str)
     with open(summary_file, "w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2, default=str)
+        f.write(text)
+    try:
+        from src.artifact_store import get_store
+        get_store().put(text, "run_summary", run_id=summary.get("run_id"), name="run_summary.json")
+    except Exception:
+        pass
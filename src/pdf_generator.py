@@ -4,6 +4,9 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowabl
 from reportlab.lib.units import inch
 import datetime
 
+from src.profiling import traced
+
+@traced("tool.pdf_render")
 def generate_pdf_report(report_data, filename="market_research_report.pdf"):
     """
     Generate a PDF report from the market research data.
@@ -0,0 +1,218 @@
+# src/prefetch.py
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.job_queue import normalize_query
+from src.observability import ARTIFACTS, log_trace
+from src.state import init_state
+
+WATCHLIST_FILE = os.environ.get("WATCHLIST_FILE", "watchlist.txt")
+PREFETCH_DB = os.environ.get("PREFETCH_DB", os.path.join(ARTIFACTS, "prefetch.db"))
+PREFETCH_AT = os.environ.get("PREFETCH_AT", "03:00")          # local time, off-peak
+MAX_SEARCHES = int(os.environ.get("PREFETCH_MAX_SEARCHES", "20"))
+MAX_FETCHES = int(os.environ.get("PREFETCH_MAX_FETCHES", "150"))
+MAX_LLM_CALLS = int(os.environ.get("PREFETCH_MAX_LLM_CALLS", "10"))
+MIN_INTERVAL_S = float(os.environ.get("PREFETCH_MIN_INTERVAL_S", "5"))
+WARM_TTL_S = float(os.environ.get("PREFETCH_WARM_TTL_S", str(24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS warmed (
+    query_key TEXT NOT NULL,
+    warmed_at REAL NOT NULL,
+    with_writer INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS warmed_query ON warmed(query_key, warmed_at);
+CREATE TABLE IF NOT EXISTS requests (
+    query_key TEXT NOT NULL,
+    requested_at REAL NOT NULL,
+    warmed INTEGER NOT NULL,
+    search_calls INTEGER, search_hits INTEGER,
+    page_calls INTEGER, page_hits INTEGER,
+    llm_calls INTEGER, llm_hits INTEGER
+);
+CREATE INDEX IF NOT EXISTS requests_time ON requests(requested_at);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(PREFETCH_DB) or ".", exist_ok=True)
+        _conn = sqlite3.connect(PREFETCH_DB, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def load_watchlist(path: str = WATCHLIST_FILE) -> List[str]:
+    # one query per line; blank lines and '#' comments ignored
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    except FileNotFoundError:
+        return []
+
+
+class Budget:
+    """
+    API budget for one prefetch pass: caps on SerpAPI searches, page fetches
+    and Groq calls, plus a minimum interval between queries.
+    """
+
+    def __init__(self, searches: int = MAX_SEARCHES, fetches: int = MAX_FETCHES,
+                 llm_calls: int = MAX_LLM_CALLS, min_interval: float = MIN_INTERVAL_S):
+        self.left = {"search": searches, "page": fetches, "llm": llm_calls}
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    def allows(self, with_writer: bool, pages_per_query: int = 10) -> bool:
+        return (self.left["search"] >= 1 and self.left["page"] >= pages_per_query
+                and (not with_writer or self.left["llm"] >= 3))
+
+    def charge(self, counts: Dict[str, int]):
+        # only cache misses reach the upstream APIs
+        for kind in self.left:
+            self.left[kind] -= counts.get(f"{kind}_calls", 0) - counts.get(f"{kind}_hits", 0)
+
+    def wait_turn(self):
+        delay = self._last + self.min_interval - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self._last = time.time()
+
+
+def prefetch(queries: List[str], with_writer: bool = False, budget: Optional[Budget] = None) -> Dict[str, Any]:
+    """
+    Warm the SerpAPI, page and (optionally) Groq caches for watch-listed
+    queries by running the research stages through the normal agents.
+    """
+    from src.agents import RESEARCH_DEADLINE_MODE, AnalystAgent, ResearcherAgent, WriterAgent, search_width
+    from src.docstore import release_docs
+
+    budget = budget or Budget()
+    # fetch every page in order, but search as wide as live runs will, so their
+    # SerpAPI lookups (keyed on the result count) hit the warmed entry
+    width = search_width(RESEARCH_DEADLINE_MODE)
+    researcher, analyst = ResearcherAgent(deadline_mode=False, top_k=width), AnalystAgent()
+    writer = WriterAgent() if with_writer else None
+
+    warmed, skipped = [], []
+    for q in queries:
+        if not budget.allows(with_writer, pages_per_query=width):
+            skipped.append(q)
+            continue
+        budget.wait_turn()
+        state = init_state(q)
+        try:
+            state = researcher.run(state)
+            state = analyst.run(state)
+            if writer is not None:
+                state = writer.run(state)
+        finally:
+            release_docs(state.get("docs", []))
+        budget.charge(state["cache_hits"])
+        if state.get("tool_error") or state.get("failure_count"):
+            skipped.append(q)
+            continue
+        with _lock:
+            conn = _db()
+            with conn:
+                conn.execute("INSERT INTO warmed VALUES (?, ?, ?)", (normalize_query(q), time.time(), int(with_writer)))
+        warmed.append(q)
+
+    summary = {"warmed": len(warmed), "skipped": len(skipped), "budget_left": budget.left}
+    log_trace("prefetch.pass", summary)
+    return summary
+
+
+def record_request(query: str, cache_hits: Dict[str, int]):
+    """
+    Called for every real run: remembers whether the query had been warmed
+    and how many of its lookups were served from cache.
+    """
+    key = normalize_query(query)
+    now = time.time()
+    with _lock:
+        conn = _db()
+        row = conn.execute(
+            "SELECT 1 FROM warmed WHERE query_key = ? AND warmed_at >= ? LIMIT 1", (key, now - WARM_TTL_S)
+        ).fetchone()
+        with conn:
+            conn.execute(
+                "INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, now, int(row is not None),
+                 cache_hits.get("search_calls", 0), cache_hits.get("search_hits", 0),
+                 cache_hits.get("page_calls", 0), cache_hits.get("page_hits", 0),
+                 cache_hits.get("llm_calls", 0), cache_hits.get("llm_hits", 0)),
+            )
+
+
+def warm_hit_report(days: float = 7) -> Dict[str, Any]:
+    """
+    Cache hit rates for real requests, split by whether the query was warmed.
+    """
+    with _lock:
+        rows = _db().execute(
+            "SELECT warmed, COUNT(*) AS requests, "
+            "SUM(search_hits) AS sh, SUM(search_calls) AS sc, SUM(page_hits) AS ph, SUM(page_calls) AS pc, "
+            "SUM(llm_hits) AS lh, SUM(llm_calls) AS lc "
+            "FROM requests WHERE requested_at >= ? GROUP BY warmed",
+            (time.time() - days * 86400,),
+        ).fetchall()
+
+    def rate(hits, calls):
+        return round(hits / calls, 3) if calls else None
+
+    report = {}
+    for r in rows:
+        report["warmed" if r["warmed"] else "cold"] = {
+            "requests": r["requests"],
+            "search_hit_rate": rate(r["sh"], r["sc"]),
+            "page_hit_rate": rate(r["ph"], r["pc"]),
+            "llm_hit_rate": rate(r["lh"], r["lc"]),
+        }
+    return report
+
+
+def _seconds_until(at: str) -> float:
+    hour, minute = (int(x) for x in at.split(":"))
+    now = datetime.datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def serve(at: str = PREFETCH_AT, with_writer: bool = False, watchlist: str = WATCHLIST_FILE):
+    # run one prefetch pass per day at the configured off-peak time
+    while True:
+        time.sleep(_seconds_until(at))
+        prefetch(load_watchlist(watchlist), with_writer=with_writer)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Off-peak cache warm-up for watch-listed queries")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("run", "serve"):
+        p = sub.add_parser(name)
+        p.add_argument("--watchlist", default=WATCHLIST_FILE)
+        p.add_argument("--with-writer", action="store_true", help="also warm the Groq writer cache")
+    sub.choices["serve"].add_argument("--at", default=PREFETCH_AT, help="local time HH:MM")
+    p_report = sub.add_parser("report")
+    p_report.add_argument("--days", type=float, default=7)
+    args = parser.parse_args()
+
+    if args.cmd == "run":
+        print(prefetch(load_watchlist(args.watchlist), with_writer=args.with_writer))
+    elif args.cmd == "serve":
+        serve(at=args.at, with_writer=args.with_writer, watchlist=args.watchlist)
+    else:
+        print(warm_hit_report(args.days))
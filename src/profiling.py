@@ -0,0 +1,204 @@
+# src/profiling.py
+import cProfile
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src.observability import ARTIFACTS, log_trace
+
+PROFILE_ENABLED = os.environ.get("PIPELINE_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("PIPELINE_PROFILE_DIR", os.path.join(ARTIFACTS, "profiles"))
+SAMPLE_INTERVAL_S = float(os.environ.get("PIPELINE_PROFILE_INTERVAL_S", "0.005"))
+TOP_ALLOCATIONS = int(os.environ.get("PIPELINE_PROFILE_TOP_ALLOCS", "30"))
+
+_active: Optional["RunProfiler"] = None
+_active_lock = threading.Lock()
+
+
+class _Sampler(threading.Thread):
+    """
+    Wall-clock sampling profiler over all threads (fetch pools included).
+    Produces collapsed stacks: "thread;module:func;module:func count".
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="pipeline-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._halt.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).replace(";", "_"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class RunProfiler:
+    """
+    Opt-in per-run profiler: cProfile on the graph thread, a sampling
+    profiler across threads, tracemalloc, and wall/CPU/memory spans for
+    every graph node and tool call.
+    """
+
+    def __init__(self, run_id: str, out_dir: str = PROFILE_DIR):
+        self.run_id = run_id
+        self.out_dir = out_dir
+        self.spans: List[Dict[str, Any]] = []
+        self._spans_lock = threading.Lock()
+        self._cprofile = cProfile.Profile()
+        self._sampler = _Sampler(SAMPLE_INTERVAL_S)
+        self._started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+        self._sampler.start()
+        self._cprofile.enable()
+
+    def stop(self) -> Dict[str, str]:
+        self._cprofile.disable()
+        self._sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        return self._write(snapshot)
+
+    @contextmanager
+    def span(self, name: str):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        mem_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            mem_after = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+            with self._spans_lock:
+                self.spans.append({
+                    "name": name,
+                    "thread": threading.current_thread().name,
+                    "wall_ms": round((time.perf_counter() - wall) * 1000, 3),
+                    "cpu_ms": round((time.thread_time() - cpu) * 1000, 3),
+                    "mem_delta_kb": round((mem_after - mem_before) / 1024, 1),
+                    "error": error,
+                })
+
+    def _write(self, snapshot) -> Dict[str, str]:
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, self.run_id)
+        paths = {
+            "cprofile": base + ".prof",
+            "collapsed": base + ".collapsed",
+            "spans": base + ".spans.jsonl",
+            "summary": base + ".summary.txt",
+            "allocations": base + ".alloc.txt",
+        }
+        # pstats dump: snakeviz / flameprof / gprof2dot
+        self._cprofile.dump_stats(paths["cprofile"])
+        # collapsed stacks: flamegraph.pl / speedscope / inferno
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(paths["spans"], "w", encoding="utf-8") as f:
+            for s in self.spans:
+                f.write(json.dumps(s) + "\n")
+
+        agg: Dict[str, Dict[str, float]] = {}
+        for s in self.spans:
+            a = agg.setdefault(s["name"], {"count": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "mem_delta_kb": 0.0})
+            a["count"] += 1
+            a["wall_ms"] += s["wall_ms"]
+            a["cpu_ms"] += s["cpu_ms"]
+            a["mem_delta_kb"] += s["mem_delta_kb"]
+        with open(paths["summary"], "w", encoding="utf-8") as f:
+            f.write(f"{'span':<32}{'count':>7}{'wall_ms':>12}{'cpu_ms':>12}{'mem_kb':>10}\n")
+            for name, a in sorted(agg.items(), key=lambda kv: -kv[1]["wall_ms"]):
+                f.write(f"{name:<32}{a['count']:>7}{a['wall_ms']:>12.1f}{a['cpu_ms']:>12.1f}{a['mem_delta_kb']:>10.1f}\n")
+
+        with open(paths["allocations"], "w", encoding="utf-8") as f:
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+        log_trace("profile.written", {"run_id": self.run_id, **paths})
+        return paths
+
+
+@contextmanager
+def profile_run(run_id: str, enabled: bool = PROFILE_ENABLED):
+    """
+    Profile one graph run. Only one run is profiled at a time; nested or
+    concurrent runs proceed unprofiled.
+    """
+    global _active
+    profiler = None
+    if enabled:
+        with _active_lock:
+            if _active is None:
+                profiler = _active = RunProfiler(run_id)
+    if profiler is None:
+        yield None
+        return
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        try:
+            profiler.stop()
+        finally:
+            with _active_lock:
+                _active = None
+
+
+@contextmanager
+def span(name: str):
+    # no-op unless a profiled run is in progress
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    with profiler.span(name):
+        yield
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator recording a span for each call of a tool function.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            # read once: another thread may end the profiled run in between
+            profiler = _active
+            if profiler is None:
+                return fn(*a, **kw)
+            with profiler.span(name):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
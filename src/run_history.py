@@ -0,0 +1,328 @@
+# src/run_history.py
+import argparse
+import collections
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.job_queue import normalize_query
+from src.observability import ARTIFACTS, log_trace
+
+HISTORY_DB = os.environ.get("RUN_HISTORY_DB", os.path.join(ARTIFACTS, "run_history.db"))
+# page bodies/text are archived per fetch; only run-level outputs are referenced here
+OUTPUT_KINDS = ("report", "article", "pdf", "run_summary")
+
+# Append-only: rows are only ever inserted. Every aggregate query filters on
+# a time range first and the indexes cover the columns it reads, so queries
+# stay index-only range scans as the tables grow.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    status TEXT NOT NULL,
+    failure_count INTEGER NOT NULL,
+    fanout INTEGER NOT NULL,
+    incremental INTEGER NOT NULL,
+    pages_skipped INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_time ON runs(started_at, status, duration_ms);
+CREATE INDEX IF NOT EXISTS runs_query ON runs(query_key, started_at);
+CREATE TABLE IF NOT EXISTS node_timings (
+    run_id TEXT NOT NULL,
+    node TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    wall_ms REAL NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS node_timings_node ON node_timings(node, started_at, wall_ms);
+CREATE INDEX IF NOT EXISTS node_timings_time ON node_timings(started_at, node, failed);
+CREATE INDEX IF NOT EXISTS node_timings_run ON node_timings(run_id);
+CREATE TABLE IF NOT EXISTS violations (
+    run_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    detail TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS violations_time ON violations(started_at, kind);
+CREATE INDEX IF NOT EXISTS violations_run ON violations(run_id);
+CREATE TABLE IF NOT EXISTS tools (
+    run_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    tool TEXT NOT NULL,
+    uses INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tools_time ON tools(started_at, tool, uses);
+CREATE TABLE IF NOT EXISTS cache_hits (
+    run_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    hits INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_hits_time ON cache_hits(started_at, kind, calls, hits);
+CREATE TABLE IF NOT EXISTS outputs (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_run ON outputs(run_id);
+"""
+
+_conn = None
+_lock = threading.Lock()
+# node timings buffered per run until the run is recorded
+_pending: Dict[str, List[tuple]] = collections.defaultdict(list)
+_pending_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+        _conn = sqlite3.connect(HISTORY_DB, timeout=30, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def violation_kind(violation: str) -> str:
+    # "schema_error: ..." -> "schema_error"; "branches_failed: 2" -> "branches_failed"
+    return violation.split(":", 1)[0].strip()
+
+
+# violations some nodes report without bumping failure_count (reviewer schema/PDF
+# errors, the research circuit breaker); "branches_failed" only summarizes failed
+# branches, which are recorded against the branch node itself
+FAILURE_VIOLATIONS = ("schema_error", "circuit_breaker_open")
+
+
+def is_failure_violation(violation: str) -> bool:
+    kind = violation_kind(violation)
+    if kind == "branches_failed":
+        return False
+    return kind in FAILURE_VIOLATIONS or kind.endswith(("_failed", "_failure"))
+
+
+def timed_node(name: str, fn: Callable) -> Callable:
+    """
+    Wrap a graph node so its wall time, and whether it failed, are recorded
+    for the run. A node failed when it raised, bumped failure_count, set
+    tool_error, added a failure violation, or (fan-out branches) returned an
+    errored partial.
+    """
+    @functools.wraps(fn)
+    def wrapper(state):
+        # nodes mutate state in place, so read the counters before the call
+        failures_before = state.get("failure_count", 0)
+        tool_error_before = state.get("tool_error", False)
+        partials_before = len(state.get("partials", []))
+        violations_before = len(state.get("violations", []))
+        started, t0 = time.time(), time.perf_counter()
+        failed = True
+        try:
+            out = fn(state)
+            failed = (out.get("failure_count", failures_before) > failures_before
+                      or (out.get("tool_error", False) and not tool_error_before)
+                      or any(is_failure_violation(v) for v in out.get("violations", [])[violations_before:])
+                      or any(p.get("error") for p in out.get("partials", [])[partials_before:]))
+            return out
+        finally:
+            with _pending_lock:
+                _pending[state.get("run_id", "")].append(
+                    (name, started, round((time.perf_counter() - t0) * 1000, 3), int(failed))
+                )
+    return wrapper
+
+
+def _run_status(res: Dict[str, Any]) -> str:
+    outputs = res.get("outputs", {})
+    if outputs.get("report"):
+        failed = (res.get("failure_count") or res.get("tool_error")
+                  or any(is_failure_violation(v) or violation_kind(v) == "branches_failed"
+                         for v in res.get("violations", [])))
+        return "degraded" if failed else "ok"
+    return "partial" if outputs.get("report_partial") else "failed"
+
+
+def record_run(res: Dict[str, Any], started_at: float, finished_at: Optional[float] = None):
+    """
+    Append one finished run (final graph state) and its buffered node timings.
+    """
+    run_id = res["run_id"]
+    finished_at = finished_at or time.time()
+    with _pending_lock:
+        timings = _pending.pop(run_id, [])
+
+    refs = []
+    try:
+        from src.artifact_store import get_store
+        refs = [(run_id, a["name"] or a["kind"], a["kind"], a["hash"])
+                for a in get_store().run_artifacts(run_id) if a["kind"] in OUTPUT_KINDS]
+    except Exception as e:
+        log_trace("run_history.refs_error", {"error": str(e)})
+    if res.get("outputs", {}).get("pdf_report"):
+        refs.append((run_id, "pdf_report", "path", res["outputs"]["pdf_report"]))
+
+    cache = res.get("cache_hits", {})
+    kinds = sorted({k.rsplit("_", 1)[0] for k in cache})
+    tools = collections.Counter(res.get("tools_used", []))
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, res["query"], normalize_query(res["query"]), started_at,
+                 round((finished_at - started_at) * 1000, 3), _run_status(res), res.get("failure_count", 0),
+                 res.get("fanout", 0), int(bool(res.get("incremental"))), res.get("pages_skipped", 0)),
+            )
+            conn.executemany("INSERT INTO node_timings VALUES (?, ?, ?, ?, ?)",
+                             [(run_id, *t) for t in timings])
+            conn.executemany("INSERT INTO violations VALUES (?, ?, ?, ?)",
+                             [(run_id, started_at, violation_kind(v), v) for v in res.get("violations", [])])
+            conn.executemany("INSERT INTO tools VALUES (?, ?, ?, ?)",
+                             [(run_id, started_at, t, n) for t, n in tools.items()])
+            conn.executemany("INSERT INTO cache_hits VALUES (?, ?, ?, ?, ?)",
+                             [(run_id, started_at, k, cache.get(f"{k}_calls", 0), cache.get(f"{k}_hits", 0))
+                              for k in kinds])
+            conn.executemany("INSERT INTO outputs VALUES (?, ?, ?, ?)", refs)
+
+
+# -------------------------------
+# Aggregate queries
+# -------------------------------
+def _since(days: float) -> float:
+    return time.time() - days * 86400
+
+
+def latency_percentile(stage: str, days: float = 7, pct: float = 95) -> Dict[str, Any]:
+    """
+    Nearest-rank percentile of wall time for a graph node, or for whole runs
+    when stage is "run". Reads only the covering index for the time range.
+    """
+    if stage == "run":
+        where, params, col, table = "started_at >= ?", (_since(days),), "duration_ms", "runs"
+    else:
+        where, params, col, table = "node = ? AND started_at >= ?", (stage, _since(days)), "wall_ms", "node_timings"
+    with _lock:
+        conn = _db()
+        n = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+        value = None
+        if n:
+            offset = max(0, min(n - 1, int(-(-pct * n // 100)) - 1))
+            value = conn.execute(
+                f"SELECT {col} FROM {table} WHERE {where} ORDER BY {col} LIMIT 1 OFFSET ?", (*params, offset)
+            ).fetchone()[0]
+    return {"stage": stage, "days": days, "pct": pct, "n": n, "ms": value}
+
+
+def failure_rate_by_stage(days: float = 7) -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT node, COUNT(*) AS calls, SUM(failed) AS failures FROM node_timings "
+            "WHERE started_at >= ? GROUP BY node ORDER BY node",
+            (_since(days),),
+        ).fetchall()
+    return {r["node"]: {"calls": r["calls"], "failures": r["failures"], "rate": round(r["failures"] / r["calls"], 4)}
+            for r in rows}
+
+
+def run_status_counts(days: float = 7) -> Dict[str, int]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT status, COUNT(*) AS n FROM runs WHERE started_at >= ? GROUP BY status", (_since(days),)
+        ).fetchall()
+    return {r["status"]: r["n"] for r in rows}
+
+
+def violation_counts(days: float = 7) -> Dict[str, int]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT kind, COUNT(*) AS n FROM violations WHERE started_at >= ? GROUP BY kind ORDER BY n DESC",
+            (_since(days),),
+        ).fetchall()
+    return {r["kind"]: r["n"] for r in rows}
+
+
+def tool_usage(days: float = 7) -> Dict[str, int]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT tool, SUM(uses) AS n FROM tools WHERE started_at >= ? GROUP BY tool ORDER BY n DESC",
+            (_since(days),),
+        ).fetchall()
+    return {r["tool"]: r["n"] for r in rows}
+
+
+def cache_hit_rates(days: float = 7) -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT kind, SUM(calls) AS calls, SUM(hits) AS hits FROM cache_hits "
+            "WHERE started_at >= ? GROUP BY kind",
+            (_since(days),),
+        ).fetchall()
+    return {r["kind"]: {"calls": r["calls"], "hits": r["hits"],
+                        "rate": round(r["hits"] / r["calls"], 4) if r["calls"] else None} for r in rows}
+
+
+def recent_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    with _lock:
+        rows = _db().execute("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        conn = _db()
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["nodes"] = [dict(r) for r in conn.execute(
+            "SELECT node, started_at, wall_ms, failed FROM node_timings WHERE run_id = ? ORDER BY started_at", (run_id,))]
+        run["violations"] = [r["detail"] for r in conn.execute(
+            "SELECT detail FROM violations WHERE run_id = ?", (run_id,))]
+        run["outputs"] = {r["name"]: r["ref"] for r in conn.execute(
+            "SELECT name, ref FROM outputs WHERE run_id = ?", (run_id,))}
+    return run
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the pipeline run history")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_latency = sub.add_parser("latency", help="latency percentile for a node, or 'run' for whole runs")
+    p_latency.add_argument("stage")
+    p_latency.add_argument("--pct", type=float, default=95)
+    for name in ("latency", "failures", "status", "violations", "tools", "cache"):
+        p = sub.choices.get(name) or sub.add_parser(name)
+        p.add_argument("--days", type=float, default=7)
+    p_runs = sub.add_parser("runs")
+    p_runs.add_argument("--limit", type=int, default=20)
+    p_show = sub.add_parser("show")
+    p_show.add_argument("run_id")
+    args = parser.parse_args()
+
+    if args.cmd == "latency":
+        result = latency_percentile(args.stage, days=args.days, pct=args.pct)
+    elif args.cmd == "failures":
+        result = failure_rate_by_stage(args.days)
+    elif args.cmd == "status":
+        result = run_status_counts(args.days)
+    elif args.cmd == "violations":
+        result = violation_counts(args.days)
+    elif args.cmd == "tools":
+        result = tool_usage(args.days)
+    elif args.cmd == "cache":
+        result = cache_hit_rates(args.days)
+    elif args.cmd == "runs":
+        result = recent_runs(args.limit)
+    else:
+        result = get_run(args.run_id)
+    print(json.dumps(result, indent=2, default=str))
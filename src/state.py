@@ -1,8 +1,15 @@
 # src/state.py
 from typing_extensions import TypedDict
 from typing import List, Dict, Any, Optional
+from typing_extensions import Annotated
 from pydantic import BaseModel
 from datetime import datetime
+import os
+import time
+import uuid
+
+RUN_LATENCY_BUDGET_S = float(os.environ.get("RUN_LATENCY_BUDGET_S", "120"))
+FANOUT_SUBQUERIES = int(os.environ.get("FANOUT_SUBQUERIES", "0"))
 
 class Fact(BaseModel):
     source: str
@@ -17,11 +24,18 @@ class FinalReport(BaseModel):
     facts: List[Fact]
     generated_at: datetime
 
+def merge_partials(left: List[Dict[str, Any]], right: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Reducer for fan-out branches. Nodes return the whole state, so the
+    # existing partials come back on every update; keep one per sub-query.
+    seen = {p["sub_query"] for p in left}
+    return left + [p for p in right if p["sub_query"] not in seen]
+
 # Graph state (shared across nodes)
 class GraphState(TypedDict):
+    run_id: str
     query: str
-    context: List[str]
-    docs: List[Dict[str, str]]        # raw retrieved docs: {path|url, text, title}
+    context: List[str]                # doc-store ids of retrieved page text
+    docs: List[Any]                   # DocRef records; text lives in src.docstore
     tools_used: List[str]
     violations: List[str]
     outputs: Dict[str, Any]          # nodes put outputs here, e.g., 'report'
@@ -30,9 +44,18 @@ class GraphState(TypedDict):
     needs_disambiguation: bool
     policy_violation: bool
     schema_ok: bool
+    deadline: float                  # epoch seconds; the model router budgets against it
+    pages_skipped: int               # fetches abandoned by deadline-aware research
+    incremental: bool                # diff against the previous run for this query
+    page_hashes: Dict[str, Dict[str, Optional[str]]]  # url -> {serp_hash, text_hash}
+    fanout: int                      # number of sub-queries to research in parallel (0 = linear graph)
+    cache_hits: Dict[str, int]       # {search,page,llm}_{calls,hits} for this run
+    partials: Annotated[List[Dict[str, Any]], merge_partials]  # per-sub-query summaries from fan-out branches
 
-def init_state(query: str) -> GraphState:
+def init_state(query: str, latency_budget: Optional[float] = None, incremental: bool = False,
+               fanout: int = FANOUT_SUBQUERIES) -> GraphState:
     return {
+        "run_id": uuid.uuid4().hex[:16],
         "query": query,
         "context": [],
         "docs": [],
@@ -44,4 +67,11 @@ def init_state(query: str) -> GraphState:
         "needs_disambiguation": False,
         "policy_violation": False,
         "schema_ok": False,
+        "pages_skipped": 0,
+        "incremental": incremental,
+        "page_hashes": {},
+        "fanout": fanout,
+        "partials": [],
+        "cache_hits": {},
+        "deadline": time.time() + (latency_budget or RUN_LATENCY_BUDGET_S),
     }
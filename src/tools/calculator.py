@@ -1,6 +1,7 @@
 # src/tools/calculator.py
 import ast
 import operator as op
+from functools import lru_cache
 
 ALLOWED_OPERATORS = {
     ast.Add: op.add,
@@ -12,22 +13,39 @@ ALLOWED_OPERATORS = {
     ast.Mod: op.mod,
 }
 
-def safe_eval(expr: str):
+
+@lru_cache(maxsize=256)
+def compile_expr(expr: str):
     """
-    Evaluate math expressions safely (no __import__ or names).
+    Parse and validate a math expression once and return a closure that
+    evaluates it. Names are looked up in the variables passed at call time,
+    so the same compiled formula works on scalars and NumPy arrays.
     """
-    def _eval(node):
-        if isinstance(node, ast.Num):
-            return node.n
-        if isinstance(node, ast.BinOp):
-            left = _eval(node.left)
-            right = _eval(node.right)
+    def _compile(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = node.value
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            name = node.id
+            return lambda env: env[name]
+        if isinstance(node, ast.BinOp) and type(node.op) in ALLOWED_OPERATORS:
             oper = ALLOWED_OPERATORS[type(node.op)]
-            return oper(left, right)
-        if isinstance(node, ast.UnaryOp):
+            left = _compile(node.left)
+            right = _compile(node.right)
+            return lambda env: oper(left(env), right(env))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in ALLOWED_OPERATORS:
             oper = ALLOWED_OPERATORS[type(node.op)]
-            return oper(_eval(node.operand))
+            operand = _compile(node.operand)
+            return lambda env: oper(operand(env))
         raise ValueError("Unsupported expression")
 
     parsed = ast.parse(expr, mode="eval")
-    return _eval(parsed.body)
+    return _compile(parsed.body)
+
+
+def safe_eval(expr: str, **variables):
+    """
+    Evaluate math expressions safely (no __import__ or builtins; names only
+    from `variables`). Compiled expressions are cached.
+    """
+    return compile_expr(expr)(variables)
@@ -0,0 +1,183 @@
+# src/tools/extractors.py
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+
+from src.observability import log_trace
+
+try:
+    import lxml.html
+except ImportError:  # optional fast backend
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional fast backend
+    LexborHTMLParser = None
+
+HTML_EXTRACTOR = os.environ.get("HTML_EXTRACTOR", "auto")
+EXTRACT_WORKERS = int(os.environ.get("HTML_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+POOL_MIN_BYTES = int(os.environ.get("HTML_EXTRACT_POOL_MIN_BYTES", "32768"))
+MAX_PAGE_CHARS = 2000
+MIN_MAIN_CHARS = 200
+
+STRIP_TAGS = ["script", "style", "nav", "header", "footer", "aside"]
+XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+def _decode(content: bytes) -> str:
+    # lxml and lexbor assume latin-1 / utf-8; honour a declared charset first
+    declared = EncodingDetector.find_declared_encoding(content, is_html=True)
+    for encoding in (declared, "utf-8"):
+        if encoding:
+            try:
+                return content.decode(encoding)
+            except (LookupError, UnicodeDecodeError):
+                pass
+    return content.decode("cp1252", errors="replace")
+
+
+def _bs4(content: bytes) -> str:
+    # reference backend: pure-Python html.parser, detects the encoding itself
+    soup = BeautifulSoup(content, "html.parser")
+    for tag in soup(STRIP_TAGS):
+        tag.extract()
+    return soup.get_text()
+
+
+def _lxml_tree(content: bytes):
+    doc = lxml.html.document_fromstring(XML_DECL_RE.sub("", _decode(content), count=1))
+    for tag in list(doc.iter(*STRIP_TAGS)):
+        tag.drop_tree()
+    return doc
+
+
+def _lxml(content: bytes) -> str:
+    return _lxml_tree(content).text_content()
+
+
+def _selectolax(content: bytes) -> str:
+    tree = LexborHTMLParser(_decode(content))
+    tree.strip_tags(STRIP_TAGS)
+    root = tree.root
+    return root.text(separator="") if root is not None else ""
+
+
+def _main(content: bytes) -> str:
+    """
+    Main-content heuristic: an <article>/<main> element when it carries enough
+    text, otherwise the block whose <p> children hold the most non-link text.
+    Falls back to the whole page when nothing stands out.
+    """
+    doc = _lxml_tree(content)
+    for node in doc.xpath("//article|//main|//*[@role='main']"):
+        text = node.text_content()
+        if len(text.strip()) >= MIN_MAIN_CHARS:
+            return text
+
+    scores: Dict = {}
+    for p in doc.iter("p"):
+        length = len(p.text_content().strip()) - sum(len(a.text_content()) for a in p.iter("a"))
+        parent = p.getparent()
+        if length <= 0 or parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + length
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + length / 2
+    if scores:
+        best = max(scores, key=scores.get)
+        if scores[best] >= MIN_MAIN_CHARS:
+            return best.text_content()
+    return doc.text_content()
+
+
+EXTRACTORS: Dict[str, Callable[[bytes], str]] = {"bs4": _bs4}
+if lxml is not None:
+    EXTRACTORS["lxml"] = _lxml
+    EXTRACTORS["main"] = _main
+if LexborHTMLParser is not None:
+    EXTRACTORS["selectolax"] = _selectolax
+
+
+def register_extractor(name: str, fn: Callable[[bytes], str]):
+    """
+    Add a backend: fn takes the raw response body and returns page text.
+    It must be a module-level function so the process pool can pickle it.
+    """
+    EXTRACTORS[name] = fn
+
+
+def available_extractors() -> List[str]:
+    return list(EXTRACTORS)
+
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    name = name or HTML_EXTRACTOR
+    if name == "auto":
+        # fastest installed backend; bs4 is always available
+        return next(b for b in ("selectolax", "lxml", "bs4") if b in EXTRACTORS)
+    if name not in EXTRACTORS:
+        raise ValueError(f"unknown HTML extractor {name!r}; available: {', '.join(EXTRACTORS)}")
+    return name
+
+
+def _extract_with(fn: Callable[[bytes], str], content: bytes, max_chars: Optional[int]) -> str:
+    # whitespace collapsed in one pass, clipped to max_chars
+    text = " ".join(fn(content).split())
+    if max_chars is not None and len(text) > max_chars:
+        text = text[:max_chars] + "..."
+    return text
+
+
+def extract(content: bytes, backend: Optional[str] = None, max_chars: Optional[int] = MAX_PAGE_CHARS) -> str:
+    return _extract_with(EXTRACTORS[resolve_backend(backend)], content, max_chars)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that is running fetch threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def extract_text(content: bytes, backend: Optional[str] = None, max_chars: Optional[int] = MAX_PAGE_CHARS,
+                 use_pool: bool = True, pool_min_bytes: Optional[int] = None) -> str:
+    """
+    Extract page text, offloading large pages (pool_min_bytes, default
+    POOL_MIN_BYTES) to the parser process pool so concurrent fetch threads
+    are not serialized on the GIL. Small pages and HTML_EXTRACT_WORKERS=0
+    parse in the calling thread.
+    """
+    backend = resolve_backend(backend)
+    if not content:
+        return ""
+    threshold = POOL_MIN_BYTES if pool_min_bytes is None else pool_min_bytes
+    if use_pool and EXTRACT_WORKERS > 0 and len(content) >= threshold:
+        try:
+            return _get_pool().submit(_extract_with, EXTRACTORS[backend], content, max_chars).result()
+        except BrokenProcessPool as e:
+            log_trace("extractors.pool_broken", {"error": str(e)})
+            shutdown_pool()
+    return _extract_with(EXTRACTORS[backend], content, max_chars)
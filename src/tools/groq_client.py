@@ -4,40 +4,39 @@ import requests
 import hashlib
 import json
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Generator, Iterator, Optional, Tuple
+
+from src.cassette import get_cassette
+from src.profiling import traced
+from src.tools.response_cache import ResponseCache
 
 ARTIFACT_CACHE = os.environ.get("ARTIFACTS_CACHE", "artifacts")
 os.makedirs(ARTIFACT_CACHE, exist_ok=True)
+RESPONSE_CACHE_DB = os.environ.get("RESPONSE_CACHE_DB", os.path.join(ARTIFACT_CACHE, "response_cache.db"))
 CACHE_FILE = os.path.join(ARTIFACT_CACHE, "groq_cache.json")
 
-def _load_cache():
-    try:
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
-
-def _save_cache(c):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(c, f, indent=2)
-
 class GroqClient:
     def __init__(self, api_key: Optional[str]=None, base_url: Optional[str]=None):
         self.api_key = api_key or os.environ.get("GROQ_API_KEY")
         self.base_url = base_url or os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
-        if not self.api_key:
+        cassette = get_cassette()
+        # replaying a cassette needs no credentials
+        if not self.api_key and (cassette is None or cassette.recording):
             raise RuntimeError("GROQ_API_KEY not set in env.")
-        self.cache = _load_cache()
+        self.cache = ResponseCache(RESPONSE_CACHE_DB, "groq", legacy_json=CACHE_FILE)
 
-    def _cache_key(self, model: str, messages: List[Dict[str, str]]):
-        h = hashlib.sha256(json.dumps({"model": model, "messages": messages}, sort_keys=True).encode()).hexdigest()
+    def _cache_key(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None):
+        body = {"model": model, "messages": messages}
+        if response_format:
+            body["response_format"] = response_format
+        h = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
         return h
 
-    def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 512, temperature: float = 0.2, use_cache: bool = True) -> str:
-        key = self._cache_key(model, messages)
-        if use_cache and key in self.cache:
-            return self.cache[key]["resp"]
+    @traced("tool.groq_save_cache")
+    def _store(self, key: str, text: str, model: str):
+        self.cache.put(key, {"resp": text, "meta": {"model": model, "time": time.time()}})
 
+    def _request(self, messages, model, max_tokens, temperature, response_format=None, stream=False):
         url = f"{self.base_url}/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -49,7 +48,39 @@ class GroqClient:
             "max_tokens": max_tokens,
             "temperature": temperature,
         }
+        if response_format:
+            payload["response_format"] = response_format
+        if stream:
+            payload["stream"] = True
+        return url, headers, payload
+
+    def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 512, temperature: float = 0.2, use_cache: bool = True,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
+        return self.chat_cached(messages, model, max_tokens, temperature, use_cache, response_format)[0]
 
+    def chat_cached(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 512, temperature: float = 0.2,
+                    use_cache: bool = True, response_format: Optional[Dict[str, Any]] = None) -> Tuple[str, bool]:
+        """
+        Like chat(), but returns (text, from_cache). The flag is per call, so
+        concurrent callers sharing the client each see their own.
+        """
+        key = self._cache_key(model, messages, response_format)
+        cassette = get_cassette()
+        # the response cache is bypassed while a cassette records or replays
+        entry = self.cache.get(key) if use_cache and cassette is None else None
+        if entry is not None:
+            return entry["resp"], True
+
+        url, headers, payload = self._request(messages, model, max_tokens, temperature, response_format)
+        if cassette is not None:
+            text = cassette.call("groq", payload, lambda: self._post(url, headers, payload), desc=model)
+        else:
+            text = self._post(url, headers, payload)
+        if text != "[GROQ_UNAVAILABLE]":
+            self._store(key, text, model)
+        return text, False
+
+    def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> str:
         # retries / backoff for 429/5xx
         attempts = 0
         while attempts <= 2:
@@ -61,9 +92,6 @@ class GroqClient:
                     text = data["choices"][0]["message"]["content"]
                 except Exception:
                     text = json.dumps(data)
-                # cache and return
-                self.cache[key] = {"resp": text, "meta": {"model": model, "time": time.time()}}
-                _save_cache(self.cache)
                 return text
             elif resp.status_code in (429, 502, 503, 504):
                 # exponential backoff
@@ -76,3 +104,98 @@ class GroqClient:
 
         # final fallback
         return "[GROQ_UNAVAILABLE]"
+
+    def chat_stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 512, temperature: float = 0.2, use_cache: bool = True,
+                    response_format: Optional[Dict[str, Any]] = None) -> Generator[str, None, bool]:
+        """
+        Stream completion deltas (SSE). Closing the generator early aborts the
+        request; only fully received responses are cached. The generator's
+        return value (StopIteration.value) says whether it was served from cache.
+        """
+        key = self._cache_key(model, messages, response_format)
+        cassette = get_cassette()
+        entry = self.cache.get(key) if use_cache and cassette is None else None
+        if entry is not None:
+            yield entry["resp"]
+            return True
+
+        url, headers, payload = self._request(messages, model, max_tokens, temperature, response_format, stream=True)
+        if cassette is not None:
+            # recorded under the non-streaming request, so chat() and chat_stream() share recordings
+            request = {k: v for k, v in payload.items() if k != "stream"}
+            if cassette.recording:
+                text = yield from self._record_stream(cassette, request, model, self._stream(url, headers, payload))
+            else:
+                text = yield from self._replay_stream(cassette, request, model)
+        else:
+            text = yield from self._stream(url, headers, payload)
+        if text is not None:
+            self._store(key, text, model)
+        return False
+
+    def _stream(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Iterator[str]:
+        # yields deltas; returns the full text, or None when the API stayed unavailable
+        attempts = 0
+        while attempts <= 2:
+            attempts += 1
+            with requests.post(url, headers=headers, json=payload, timeout=30, stream=True) as resp:
+                if resp.status_code in (429, 502, 503, 504):
+                    time.sleep(1 * (2 ** (attempts - 1)))
+                    continue
+                if resp.status_code != 200:
+                    raise RuntimeError(f"GROQ API error {resp.status_code}: {resp.text}")
+                parts = []
+                for line in resp.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0]["delta"].get("content") or ""
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                return "".join(parts)
+
+        yield "[GROQ_UNAVAILABLE]"
+        return None
+
+    @staticmethod
+    def _record_stream(cassette, request: Dict[str, Any], model: str, stream: Iterator[str]) -> Iterator[str]:
+        # chunk offsets are kept so replay reproduces time-to-first-token;
+        # streams closed early by the caller are recorded as far as they got
+        start = time.perf_counter()
+        chunks = []
+        try:
+            for delta in stream:
+                chunks.append([round(time.perf_counter() - start, 4), delta])
+                yield delta
+        except GeneratorExit:
+            # caller closed the stream early: abort the request, keep what was received
+            stream.close()
+            cassette.record("groq", request, {"ok": "".join(d for _, d in chunks), "chunks": chunks},
+                            time.perf_counter() - start, model)
+            raise
+        except Exception as e:
+            cassette.record("groq", request, {"error": f"{type(e).__name__}: {e}"}, time.perf_counter() - start, model)
+            raise
+        text = "".join(d for _, d in chunks)
+        cassette.record("groq", request, {"ok": text, "chunks": chunks}, time.perf_counter() - start, model)
+        return text if text != "[GROQ_UNAVAILABLE]" else None
+
+    @staticmethod
+    def _replay_stream(cassette, request: Dict[str, Any], model: str) -> Iterator[str]:
+        entry = cassette.lookup("groq", request, desc=model)
+        if "error" in entry["response"]:
+            raise RuntimeError(f"recorded error: {entry['response']['error']}")
+        chunks = entry["response"].get("chunks") or [[entry["elapsed"], entry["response"]["ok"]]]
+        last = 0.0
+        for offset, delta in chunks:
+            cassette.delay(offset - last)
+            last = offset
+            yield delta
+        text = entry["response"]["ok"]
+        return text if text != "[GROQ_UNAVAILABLE]" else None
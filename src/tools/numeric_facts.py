@@ -0,0 +1,166 @@
+# src/tools/numeric_facts.py
+import re
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.tools.calculator import safe_eval
+
+CAGR_EXPR = "(end / start) ** (1 / years) - 1"
+GROWTH_EXPR = "(current - previous) / previous"
+
+SCALES = {
+    "trillion": 1e12, "tn": 1e12, "t": 1e12,
+    "billion": 1e9, "bn": 1e9, "b": 1e9,
+    "million": 1e6, "mn": 1e6, "m": 1e6,
+    "thousand": 1e3, "k": 1e3,
+}
+CURRENCIES = {"us$": "USD", "usd": "USD", "$": "USD", "€": "EUR", "eur": "EUR", "£": "GBP", "gbp": "GBP"}
+
+# One pattern, one pass over the whole batch; the named group tells the figure kind.
+FIGURE_RE = re.compile(
+    r"(?P<cur>US\$|USD|\$|€|EUR|£|GBP)\s?(?P<amt>\d[\d,]*(?:\.\d+)?)\s?"
+    r"(?P<scale>trillion|billion|million|thousand|tn|bn|mn|[tbmk])?\b"
+    r"|(?P<pct>[-+]?\d+(?:\.\d+)?)\s?(?:%|percent\b|pc\b)"
+    r"|\b(?P<year>(?:19|20)\d{2})\b",
+    re.I,
+)
+CAGR_RE = re.compile(r"CAGR|compound annual|annual growth", re.I)
+
+YEAR_WINDOW = 80        # chars between a money figure and the year it refers to
+CAGR_WINDOW = 60        # chars between a percentage and a CAGR mention
+SEP = "\n\x00\n"
+
+
+def extract_figures(texts: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Extract currency amounts, percentages and years from all texts in one
+    regex pass and return them as parallel NumPy arrays.
+    """
+    corpus = SEP.join(texts)
+    starts = np.cumsum([0] + [len(t) + len(SEP) for t in texts[:-1]]) if texts else np.zeros(0, dtype=np.int64)
+
+    money_pos, money_val, money_cur = [], [], []
+    pct_pos, pct_val = [], []
+    year_pos, year_val = [], []
+    for m in FIGURE_RE.finditer(corpus):
+        if m.group("amt"):
+            try:
+                value = float(m.group("amt").replace(",", ""))
+            except ValueError:
+                continue
+            scale = (m.group("scale") or "").lower()
+            money_pos.append(m.start())
+            money_val.append(value * SCALES.get(scale, 1.0))
+            money_cur.append(CURRENCIES.get(m.group("cur").lower(), "USD"))
+        elif m.group("pct"):
+            pct_pos.append(m.start())
+            pct_val.append(float(m.group("pct")))
+        elif m.group("year"):
+            year_pos.append(m.start())
+            year_val.append(int(m.group("year")))
+
+    money_pos = np.asarray(money_pos, dtype=np.int64)
+    pct_pos = np.asarray(pct_pos, dtype=np.int64)
+    year_pos = np.asarray(year_pos, dtype=np.int64)
+    year_val = np.asarray(year_val, dtype=np.int64)
+    cagr_pos = np.asarray([m.start() for m in CAGR_RE.finditer(corpus)], dtype=np.int64)
+
+    def doc_of(pos):
+        return np.searchsorted(starts, pos, side="right") - 1
+
+    money_doc, pct_doc = doc_of(money_pos), doc_of(pct_pos)
+    return {
+        "money_value": np.asarray(money_val, dtype=np.float64),
+        "money_currency": np.asarray(money_cur, dtype=object),
+        "money_doc": money_doc,
+        "money_year": _nearest(money_pos, money_doc, year_pos, doc_of(year_pos), year_val, YEAR_WINDOW),
+        "pct_value": np.asarray(pct_val, dtype=np.float64),
+        "pct_doc": pct_doc,
+        "pct_is_cagr": _nearest(pct_pos, pct_doc, cagr_pos, doc_of(cagr_pos), np.ones_like(cagr_pos), CAGR_WINDOW) > 0,
+    }
+
+
+def _nearest(pos: np.ndarray, doc: np.ndarray, ref_pos: np.ndarray, ref_doc: np.ndarray,
+             ref_val: np.ndarray, window: int) -> np.ndarray:
+    """
+    For every position, the value of the closest reference position in the
+    same document within `window` characters (0 when none).
+    """
+    out = np.zeros(len(pos), dtype=np.int64)
+    if len(pos) == 0 or len(ref_pos) == 0:
+        return out
+    idx = np.searchsorted(ref_pos, pos)
+    left = np.clip(idx - 1, 0, len(ref_pos) - 1)
+    right = np.clip(idx, 0, len(ref_pos) - 1)
+    # documents are contiguous, so the nearest same-document reference is always
+    # an immediate neighbour; neighbours from another document are out of range
+    far = np.iinfo(np.int64).max
+    d_left = np.where(ref_doc[left] == doc, np.abs(pos - ref_pos[left]), far)
+    d_right = np.where(ref_doc[right] == doc, np.abs(ref_pos[right] - pos), far)
+    best = np.where(d_left <= d_right, left, right)
+    dist = np.minimum(d_left, d_right)
+    return np.where(dist <= window, ref_val[best], 0)
+
+
+def market_metrics(figures: Dict[str, np.ndarray], currency: str = "USD") -> Dict[str, Any]:
+    """
+    Consensus ranges, year-over-year growth and implied CAGR computed on the
+    extracted arrays. Returns plain Python types so the result can live in state.
+    """
+    mask = (figures["money_currency"] == currency) & (figures["money_year"] > 0) & (figures["money_value"] >= 1e6)
+    values = figures["money_value"][mask]
+    years = figures["money_year"][mask]
+
+    metrics: Dict[str, Any] = {"currency": currency, "n_figures": int(mask.sum())}
+    if len(values):
+        uniq = np.unique(years)
+        # per-year consensus: interquartile range and median across sources
+        q = np.array([np.percentile(values[years == y], [25, 50, 75]) for y in uniq])
+        metrics["by_year"] = {
+            int(y): {"low": float(lo), "median": float(med), "high": float(hi), "n": int((years == y).sum())}
+            for y, (lo, med, hi) in zip(uniq, q)
+        }
+        if len(uniq) > 1:
+            med = q[:, 1]
+            growth = safe_eval(GROWTH_EXPR, current=med[1:], previous=med[:-1]) / np.diff(uniq)
+            metrics["growth_per_year"] = {f"{int(a)}-{int(b)}": float(g) for a, b, g in zip(uniq[:-1], uniq[1:], growth)}
+            metrics["implied_cagr"] = {
+                "from": int(uniq[0]), "to": int(uniq[-1]),
+                "value": float(safe_eval(CAGR_EXPR, end=med[-1], start=med[0], years=float(uniq[-1] - uniq[0]))),
+            }
+
+    cagr = figures["pct_value"][figures["pct_is_cagr"]]
+    if len(cagr):
+        lo, med, hi = np.percentile(cagr, [25, 50, 75])
+        metrics["stated_cagr_pct"] = {"low": float(lo), "median": float(med), "high": float(hi), "n": int(len(cagr))}
+    return metrics
+
+
+def compute_market_figures(texts: List[str]) -> Dict[str, Any]:
+    return market_metrics(extract_figures(texts))
+
+
+def _fmt_money(v: float) -> str:
+    for unit, scale in (("T", 1e12), ("B", 1e9), ("M", 1e6)):
+        if abs(v) >= scale:
+            return f"${v / scale:.2f}{unit}"
+    return f"${v:,.0f}"
+
+
+def format_figures(metrics: Dict[str, Any]) -> str:
+    """
+    Compact text block for the writer prompt; empty when nothing was found.
+    """
+    lines = []
+    for year, r in sorted(metrics.get("by_year", {}).items()):
+        lines.append(f"- {year}: {_fmt_money(r['median'])} median ({_fmt_money(r['low'])}-{_fmt_money(r['high'])}, {r['n']} figures)")
+    for span, g in metrics.get("growth_per_year", {}).items():
+        lines.append(f"- growth {span}: {g * 100:.1f}%/yr")
+    if "implied_cagr" in metrics:
+        c = metrics["implied_cagr"]
+        lines.append(f"- implied CAGR {c['from']}-{c['to']}: {c['value'] * 100:.1f}%")
+    if "stated_cagr_pct" in metrics:
+        c = metrics["stated_cagr_pct"]
+        lines.append(f"- stated CAGR: {c['median']:.1f}% median ({c['low']:.1f}-{c['high']:.1f}%, {c['n']} mentions)")
+    return "\n".join(lines)
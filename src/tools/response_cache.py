@@ -0,0 +1,72 @@
+# src/tools/response_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.observability import log_trace
+
+# SerpAPI and Groq responses shared by every process (graph runs, job-queue
+# workers, the prefetcher). SQLite serializes concurrent writers, and each
+# write touches one row instead of rewriting the whole cache.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+class ResponseCache:
+    """
+    Key/value cache of JSON responses for one namespace ("serp", "groq").
+    Entries from a legacy JSON cache file are imported on first use.
+    """
+
+    def __init__(self, path: str, namespace: str, legacy_json: Optional[str] = None):
+        self.namespace = namespace
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        if legacy_json and os.path.exists(legacy_json):
+            self._import(legacy_json)
+
+    def _import(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            # OR IGNORE: entries written since (or by another importer) win
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?)",
+                [(self.namespace, k, json.dumps(v), now) for k, v in entries.items()],
+            )
+        try:
+            os.replace(path, path + ".imported")
+        except OSError:  # another process imported it first
+            pass
+        log_trace("response_cache.imported", {"namespace": self.namespace, "entries": len(entries)})
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM responses WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time()),
+            )
@@ -1,21 +1,76 @@
 # src/tools/search.py
+import hashlib
+import json
 import os
 import requests
-from typing import List, Dict
-from bs4 import BeautifulSoup
+import threading
+from typing import List, Dict, Optional, Tuple
 import time
 
+from src.cassette import decode_bytes, encode_bytes, get_cassette
+from src.profiling import span, traced
+from src.tools.extractors import extract_text
+from src.tools.response_cache import ResponseCache
+
+
+ARTIFACT_CACHE = os.environ.get("ARTIFACTS_CACHE", "artifacts")
+os.makedirs(ARTIFACT_CACHE, exist_ok=True)
+# shared with the Groq client and the prefetcher; the old JSON file is imported once
+RESPONSE_CACHE_DB = os.environ.get("RESPONSE_CACHE_DB", os.path.join(ARTIFACT_CACHE, "response_cache.db"))
+SEARCH_CACHE_FILE = os.path.join(ARTIFACT_CACHE, "serp_cache.json")
+SEARCH_CACHE_TTL_S = float(os.environ.get("SEARCH_CACHE_TTL_S", str(24 * 3600)))
+
+
+class FetchCancelled(Exception):
+    pass
+
+
 class SearchTool:
     def __init__(self, serpapi_key: str = None):
         self.serpapi_key = serpapi_key or os.environ.get("SERPAPI_KEY")
-        if not self.serpapi_key:
+        cassette = get_cassette()
+        # replaying a cassette needs no credentials
+        if not self.serpapi_key and (cassette is None or cassette.recording):
             raise RuntimeError("SERPAPI_KEY not set in env")
+        self.cache = ResponseCache(RESPONSE_CACHE_DB, "serp", legacy_json=SEARCH_CACHE_FILE)
 
-    def web_search(self, query: str, top_k: int = 10) -> List[Dict]:
+    def web_search(self, query: str, top_k: int = 10, use_cache: bool = True) -> List[Dict]:
         """
         Perform a Google search via SerpAPI.
         Returns list of dicts {title, url, snippet}.
         """
+        return self.web_search_cached(query, top_k, use_cache)[0]
+
+    @traced("tool.web_search")
+    def web_search_cached(self, query: str, top_k: int = 10, use_cache: bool = True) -> Tuple[List[Dict], bool]:
+        """
+        Like web_search(), but returns (results, from_cache). Results are cached
+        for SEARCH_CACHE_TTL_S (shared with the prefetcher); the cache is
+        bypassed while a cassette records or replays.
+        """
+        key = hashlib.sha256(json.dumps({"q": query, "num": top_k}, sort_keys=True).encode()).hexdigest()
+        cassette = get_cassette()
+        if use_cache and cassette is None:
+            entry = self.cache.get(key)
+            if entry and time.time() - entry["time"] < SEARCH_CACHE_TTL_S:
+                return entry["results"], True
+
+        if cassette is not None:
+            data = cassette.call("serp", {"q": query, "num": top_k}, lambda: self._serp_request(query, top_k), desc=query)
+        else:
+            data = self._serp_request(query, top_k)
+        results = []
+        for item in data.get("organic_results", []):
+            results.append({
+                "title": item.get("title", ""),
+                "url": item.get("link", ""),
+                "snippet": item.get("snippet", "")
+            })
+        with span("tool.serp_save_cache"):
+            self.cache.put(key, {"results": results, "time": time.time()})
+        return results, False
+
+    def _serp_request(self, query: str, top_k: int) -> Dict:
         url = "https://serpapi.com/search.json"
         params = {
             "engine": "google",
@@ -26,81 +81,95 @@ class SearchTool:
         resp = requests.get(url, params=params, timeout=20)
         if resp.status_code != 200:
             raise RuntimeError(f"SerpAPI error {resp.status_code}: {resp.text}")
-        data = resp.json()
-        results = []
-        for item in data.get("organic_results", []):
-            results.append({
-                "title": item.get("title", ""),
-                "url": item.get("link", ""),
-                "snippet": item.get("snippet", "")
-            })
-        return results
+        return resp.json()
 
-    def fetch_full_page(self, url: str) -> str:
+    def fetch_full_page(self, url: str, timeout: float = 15, cancel: Optional[threading.Event] = None) -> str:
         """
         Fetch the full text content of a webpage with robust error handling.
         Returns cleaned text content, limited to 2000 characters.
+        Setting `cancel` aborts the download between body chunks.
+        """
+        return self.fetch_page(url, timeout=timeout, cancel=cancel)[1]
+
+    def _download(self, url: str, timeout: float, cancel: Optional[threading.Event]) -> bytes:
+        # raw response body; b"" for blocked or non-200 responses
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        }
+
+        # the retry below shares the caller's timeout rather than starting afresh
+        deadline = time.time() + timeout
+
+        # First try with SSL verification
+        try:
+            resp = requests.get(url, headers=headers, timeout=timeout, verify=True, stream=True)
+            resp.raise_for_status()
+        except requests.exceptions.SSLError:
+            if cancel is not None and cancel.is_set():
+                raise FetchCancelled(url)
+            # Fallback to without SSL verification
+            print(f"SSL verification failed for {url}, trying without verification...")
+            resp = requests.get(url, headers=headers, timeout=max(0.5, deadline - time.time()), verify=False, stream=True)
+            resp.raise_for_status()
+
+        # Handle different response status codes
+        if resp.status_code == 403:
+            print(f"Access forbidden for {url} - site blocks automated requests")
+            return b""
+        elif resp.status_code != 200:
+            print(f"HTTP {resp.status_code} error for {url}")
+            return b""
+
+        chunks = []
+        with resp:
+            for chunk in resp.iter_content(chunk_size=16384):
+                if cancel is not None and cancel.is_set():
+                    raise FetchCancelled(url)
+                chunks.append(chunk)
+        if cancel is not None and cancel.is_set():
+            # cancelled while the last chunk arrived: skip the parse
+            raise FetchCancelled(url)
+        return b"".join(chunks)
+
+    @traced("tool.fetch_page")
+    def fetch_page(self, url: str, timeout: float = 15, cancel: Optional[threading.Event] = None) -> Tuple[bytes, str]:
+        """
+        Like fetch_full_page, but also returns the raw response body so it can
+        be archived. Returns (b"", "") on failure.
         """
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-            }
-
-            # First try with SSL verification
-            try:
-                resp = requests.get(url, headers=headers, timeout=15, verify=True)
-                resp.raise_for_status()
-            except requests.exceptions.SSLError:
-                # Fallback to without SSL verification
-                print(f"SSL verification failed for {url}, trying without verification...")
-                resp = requests.get(url, headers=headers, timeout=15, verify=False)
-                resp.raise_for_status()
-
-            # Handle different response status codes
-            if resp.status_code == 403:
-                print(f"Access forbidden for {url} - site blocks automated requests")
-                return ""
-            elif resp.status_code != 200:
-                print(f"HTTP {resp.status_code} error for {url}")
-                return ""
-
-            # Detect encoding properly
-            resp.encoding = resp.apparent_encoding or 'utf-8'
-
-            soup = BeautifulSoup(resp.content, "html.parser")
-
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-                script.extract()
-
-            # Get text content
-            text = soup.get_text()
-
-            # Clean up whitespace and normalize
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-
-            # Remove excessive whitespace
-            text = ' '.join(text.split())
-
-            # Limit to 2000 characters to manage token budget
-            if len(text) > 2000:
-                text = text[:2000] + "..."
-
-            return text
+            cassette = get_cassette()
+            if cassette is not None:
+                content = cassette.call(
+                    "page", {"url": url}, lambda: self._download(url, timeout, cancel),
+                    encode=encode_bytes, decode=decode_bytes, desc=url,
+                    cancel=cancel, cancelled=lambda: FetchCancelled(url),
+                )
+            else:
+                content = self._download(url, timeout, cancel)
+            if not content:
+                return b"", ""
+
+            with span("tool.fetch_page.parse"):
+                # HTML_EXTRACTOR backend; large pages are parsed in the process pool.
+                # Text is limited to 2000 characters to manage token budget.
+                text = extract_text(content)
+
+            return content, text
 
+        except FetchCancelled:
+            return b"", ""
         except requests.exceptions.Timeout:
             print(f"Timeout fetching {url}")
-            return ""
+            return b"", ""
         except requests.exceptions.RequestException as e:
             print(f"Request error for {url}: {str(e)}")
-            return ""
+            return b"", ""
         except Exception as e:
             print(f"Failed to fetch {url}: {str(e)}")
-            return ""
+            return b"", ""